@@ -1,12 +1,14 @@
+import csv
 import io
 from datetime import date, timedelta
 
 from django.core import mail
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from testapp import factories
-from testapp.utils import admin_login
+from testapp.utils import admin_login, temporary_private_root
+from zivinetz.forms import add_last_assignment_and_mark
 from zivinetz.models import Assignment, Drudge, JobReference
 
 
@@ -136,6 +138,84 @@ class AdminViewsTestCase(TestCase):
         self.assertEqual(attachment[0], "requirements.txt")
         self.assertIn("Django", attachment[1])
 
+    def test_last_assignment_and_mark(self):
+        first = factories.AssignmentFactory.create(date_from=date(2020, 1, 6))
+        last = factories.AssignmentFactory.create(
+            drudge=first.drudge, date_from=date(2021, 1, 4)
+        )
+        factories.AssignmentFactory.create(date_from=date(2022, 1, 3))
+        without = factories.DrudgeFactory.create()
+
+        drudges = list(Drudge.objects.filter(pk__in=[first.drudge_id, without.pk]))
+        with self.assertNumQueries(2):
+            add_last_assignment_and_mark(drudges)
+        self.assertEqual(
+            {drudge.pk: getattr(drudge, "last_assignment", None) for drudge in drudges},
+            {first.drudge_id: last, without.pk: None},
+        )
+
+    @override_settings(ZIVINETZ_SEARCH_BACKEND="document")
+    def test_search_documents(self):
+        assignment = factories.AssignmentFactory.create()
+        drudge = assignment.drudge
+        other = factories.DrudgeFactory.create()
+        drudge.user.last_name = "Zimmermann"
+        drudge.user.save()
+
+        def search(model, query):
+            return set(model.objects.search(query))
+
+        self.assertEqual(search(Drudge, "zimmer"), {drudge})
+        self.assertEqual(search(Drudge, "-Zimmermann"), {other})
+        self.assertEqual(search(Assignment, "ZIMMERMANN"), {assignment})
+        self.assertEqual(
+            search(Assignment, f"zimmermann {assignment.specification.code}"),
+            {assignment},
+        )
+
+        with override_settings(ZIVINETZ_SEARCH_BACKEND="fields"):
+            self.assertEqual(search(Drudge, "zimmer"), {drudge})
+
+            # The documents are not maintained without the document backend
+            with self.assertNumQueries(1):
+                drudge.save()
+
+        drudge.user.last_name = "Müller"
+        drudge.user.save(update_fields=["last_name"])
+        self.assertEqual(search(Drudge, "zimmer"), set())
+        self.assertEqual(search(Assignment, "müller"), {assignment})
+
+    def test_csv_exports(self):
+        admin_login(self)
+        self.admin.userprofile.user_type = "dev_admin"
+        self.admin.userprofile.save()
+
+        for _i in range(3):
+            assignment = factories.AssignmentFactory.create()
+            assignment.assessments.create(drudge=assignment.drudge, mark=4)
+
+        response = self.client.get("/zivinetz/admin/assignments/csv/")
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(response.getvalue().decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0][0], "ZDP-Nr.")
+
+        assignment.status = Assignment.MOBILIZED
+        assignment.date_from = date.today() - timedelta(days=7)
+        assignment.date_until = date.today() + timedelta(days=7)
+        assignment.save()
+        assignment.assessments.create(drudge=assignment.drudge, mark=5)
+
+        response = self.client.get("/zivinetz/admin/drudges/csv/")
+        self.assertTrue(response.streaming)
+        with self.assertNumQueries(3):
+            rows = list(csv.reader(io.StringIO(response.getvalue().decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            sorted((row[3], row[8]) for row in rows[1:]),
+            [("-", "4.0"), ("-", "4.0"), ("Aufgeboten", "4.5")],
+        )
+
     def test_drudge_detail(self):
         admin_login(self)
         drudge = factories.DrudgeFactory.create()
@@ -178,6 +258,7 @@ class AdminViewsTestCase(TestCase):
         self.assertContains(response, "<tr data-value=", 50)
 
     def test_jobreferences(self):
+        temporary_private_root(self)
         template = factories.JobReferenceTemplateFactory.create()
         assignment = factories.AssignmentFactory.create()
 
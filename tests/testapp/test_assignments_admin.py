@@ -1,10 +1,24 @@
+import io
+import os
+import tempfile
 from datetime import date, timedelta
 
+from django.core.management import call_command
 from django.test import TestCase
+from openpyxl import load_workbook
 
 from testapp import factories
 from testapp.utils import admin_login, get_messages, model_to_postable_dict
-from zivinetz.models import Assignment, Drudge, ExpenseReport
+from zivinetz.forms import AssignDrudgesToGroupsForm
+from zivinetz.models import (
+    Absence,
+    Assignment,
+    Drudge,
+    ExpenseReport,
+    Group,
+    GroupAssignment,
+)
+from zivinetz.views.groups import create_groups_range_xlsx
 
 
 class AssignmentsAdminViewsTestCase(TestCase):
@@ -223,3 +237,272 @@ class AssignmentsAdminViewsTestCase(TestCase):
         assignment.generate_expensereports()
         new = assignment.reports.count()
         self.assertTrue(new in (previous + 2, previous + 3))
+
+    def test_groups_xlsx(self):
+        admin_login(self)
+
+        new = factories.AssignmentFactory.create(
+            date_from=date(2024, 1, 10), date_until=date(2024, 6, 1)
+        )
+        GroupAssignment.objects.create(
+            group=Group.objects.create(name="Wald"),
+            assignment=new,
+            week=date(2024, 1, 8),
+        )
+        free = factories.AssignmentFactory.create(
+            date_from=date(2023, 12, 1), date_until=date(2024, 3, 1)
+        )
+        Absence.objects.create(
+            assignment=free,
+            created_by=self.admin,
+            reason=Absence.SICK,
+            days=[date(2024, 1, 11)],
+        )
+
+        response = self.client.get("/zivinetz/admin/groups/2024-01-08/?xlsx=1")
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="wochenrapport-2024-01-08.xlsx"',
+        )
+        ws = load_workbook(io.BytesIO(response.content)).active
+
+        self.assertEqual(ws["C1"].value, "Montag")
+        self.assertEqual(ws["A7"].value, "Wald")
+        self.assertEqual(ws["A7"].style, "darker")
+        self.assertEqual(ws["A8"].value, new.drudge.user.get_full_name())
+        self.assertEqual(ws["B8"].value, "NEU")
+        self.assertEqual(ws["C8"].value, "Vor Beginn")
+        self.assertEqual(ws["C8"].style, "borderThickLeft")
+        self.assertEqual(ws["L8"].value, "Vor Beginn")
+        self.assertIsNone(ws["U8"].value)
+        self.assertEqual(ws["A14"].value, "Nicht zugeteilt")
+        self.assertEqual(ws["A15"].value, free.drudge.user.get_full_name())
+        self.assertEqual(ws["AD15"].value, "Krank")
+
+        # The empty grid is styled per column, not per cell
+        self.assertEqual(ws.column_dimensions["C"].border.left.style, "medium")
+        self.assertEqual(ws.column_dimensions["D"].border.left.style, "thin")
+        self.assertEqual(ws.column_dimensions["E"].fill.fgColor.rgb, "00cccccc")
+        self.assertLess(ws.max_row, 30)
+
+    def test_group_reports_export(self):
+        admin_login(self)
+
+        forest = factories.AssignmentFactory.create(
+            date_from=date(2024, 1, 1), date_until=date(2024, 6, 1)
+        )
+        meadow = factories.AssignmentFactory.create(
+            date_from=date(2024, 1, 10), date_until=date(2024, 6, 1)
+        )
+        GroupAssignment.objects.create(
+            group=Group.objects.create(name="Wald"),
+            assignment=forest,
+            week=date(2024, 1, 15),
+        )
+        scope_statements = [
+            forest.specification.scope_statement,
+            meadow.specification.scope_statement,
+        ]
+
+        with self.assertNumQueries(4):
+            wb = create_groups_range_xlsx(date(2024, 1, 3), date(2024, 1, 19))
+        self.assertEqual(wb.sheetnames, ["2024 KW 01", "2024 KW 02", "2024 KW 03"])
+        ws = wb["2024 KW 01"]
+        self.assertEqual(ws["A7"].value, "Wald")
+        self.assertEqual(ws["A15"].value, forest.drudge.user.get_full_name())
+        ws = wb["2024 KW 03"]
+        self.assertEqual(ws["A8"].value, forest.drudge.user.get_full_name())
+        self.assertEqual(ws["A15"].value, meadow.drudge.user.get_full_name())
+
+        with self.assertNumQueries(4):
+            wb = create_groups_range_xlsx(
+                date(2024, 1, 15), date(2024, 1, 15), scope_statements
+            )
+        self.assertEqual(
+            [ws["A15"].value for ws in wb.worksheets],
+            [None, meadow.drudge.user.get_full_name()],
+        )
+        self.assertEqual(
+            wb.worksheets[0]["A8"].value, forest.drudge.user.get_full_name()
+        )
+
+        response = self.client.get(
+            "/zivinetz/admin/groups/export/?date_from=2024-01-19&date_until=2024-01-03"
+        )
+        self.assertRedirects(
+            response, "/zivinetz/admin/groups/", fetch_redirect_response=False
+        )
+        self.assertEqual(
+            get_messages(self.client.get("/zivinetz/admin/groups/")),
+            ["The date range is invalid."],
+        )
+
+        response = self.client.get(
+            "/zivinetz/admin/groups/export/?date_from=2024-01-03&date_until=2024-01-19"
+        )
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="wochenrapporte-2024-01-03-2024-01-19.xlsx"',
+        )
+        self.assertEqual(len(load_workbook(io.BytesIO(response.content)).worksheets), 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "reports.xlsx")
+            call_command(
+                "export_group_reports",
+                "2024-01-03",
+                "2024-01-19",
+                path,
+                scope_statement=[scope_statements[0].pk],
+                stdout=io.StringIO(),
+            )
+            self.assertEqual(len(load_workbook(path).worksheets), 3)
+
+    def test_assign_groups(self):
+        admin_login(self)
+
+        monday = date(2024, 1, 8)
+        forest = Group.objects.create(name="Wald")
+        meadow = Group.objects.create(name="Wiese")
+        moved, removed, added, kept = [
+            factories.AssignmentFactory.create(
+                date_from=date(2024, 1, 1), date_until=date(2024, 6, 1)
+            )
+            for _i in range(4)
+        ]
+        GroupAssignment.objects.create(group=forest, assignment=moved, week=monday)
+        GroupAssignment.objects.create(group=forest, assignment=removed, week=monday)
+        GroupAssignment.objects.create(group=meadow, assignment=kept, week=monday)
+
+        response = self.client.get("/zivinetz/admin/groups/2024-01-08/")
+        self.assertContains(response, 'name="asg_%s"' % added.pk)
+
+        form = AssignDrudgesToGroupsForm(
+            {
+                "asg_%s" % moved.pk: meadow.pk,
+                "asg_%s" % added.pk: forest.pk,
+                "asg_%s" % kept.pk: meadow.pk,
+            },
+            day=monday,
+            scope_statement=None,
+        )
+        with self.assertNumQueries(4):
+            self.assertTrue(form.is_valid())
+            # SAVEPOINT, INSERT ... ON CONFLICT, DELETE, RELEASE SAVEPOINT
+            form.save()
+
+        self.assertEqual(
+            dict(
+                GroupAssignment.objects.filter(week=monday).values_list(
+                    "assignment", "group"
+                )
+            ),
+            {moved.pk: meadow.pk, added.pk: forest.pk, kept.pk: meadow.pk},
+        )
+
+        response = self.client.post(
+            "/zivinetz/admin/groups/2024-01-08/",
+            {"asg_%s" % removed.pk: forest.pk},
+        )
+        self.assertRedirects(response, "/zivinetz/admin/groups/")
+        self.assertEqual(
+            dict(
+                GroupAssignment.objects.filter(week=monday).values_list(
+                    "assignment", "group"
+                )
+            ),
+            {removed.pk: forest.pk},
+        )
+
+    def test_copy_group_assignments_forward(self):
+        admin_login(self)
+
+        forest = Group.objects.create(name="Wald")
+        meadow = Group.objects.create(name="Wiese")
+        long, short, planned = [
+            factories.AssignmentFactory.create(
+                date_from=date(2024, 1, 1), date_until=date_until
+            )
+            for date_until in [date(2024, 6, 1), date(2024, 1, 20), date(2024, 6, 1)]
+        ]
+        for assignment in [long, short, planned]:
+            GroupAssignment.objects.create(
+                group=forest, assignment=assignment, week=date(2024, 1, 8)
+            )
+        GroupAssignment.objects.create(
+            group=meadow, assignment=planned, week=date(2024, 1, 15)
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                GroupAssignment.objects.copy_forward(date(2024, 1, 10), 3), 6
+            )
+        self.assertEqual(
+            sorted(
+                GroupAssignment.objects.filter(week__gt=date(2024, 1, 8)).values_list(
+                    "assignment", "week", "group"
+                )
+            ),
+            sorted([
+                (long.pk, date(2024, 1, 15), forest.pk),
+                (long.pk, date(2024, 1, 22), forest.pk),
+                (long.pk, date(2024, 1, 29), forest.pk),
+                (short.pk, date(2024, 1, 15), forest.pk),
+                (planned.pk, date(2024, 1, 15), meadow.pk),
+                (planned.pk, date(2024, 1, 22), forest.pk),
+                (planned.pk, date(2024, 1, 29), forest.pk),
+            ]),
+        )
+
+        url = "/zivinetz/admin/groups/2024-01-29/"
+        response = self.client.post(url, {"copy_forward": "1"})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(
+            get_messages(self.client.get(url)),
+            ["Copied 2 group assignments into the following weeks."],
+        )
+
+        self.client.post(url, {"copy_forward": "abc"})
+        self.assertEqual(
+            get_messages(self.client.get(url)),
+            ["Enter a number of weeks between 1 and 52."],
+        )
+
+        # Only the group assignments matched by the queryset and the scope
+        # statement are copied
+        self.assertEqual(
+            GroupAssignment.objects.filter(assignment=long).copy_forward(
+                date(2024, 2, 5), 2
+            ),
+            2,
+        )
+        self.assertEqual(
+            GroupAssignment.objects.copy_forward(
+                date(2024, 2, 5),
+                1,
+                scope_statement=planned.specification.scope_statement,
+            ),
+            1,
+        )
+        self.assertEqual(
+            sorted(
+                GroupAssignment.objects.filter(week__gt=date(2024, 2, 5)).values_list(
+                    "assignment", "week"
+                )
+            ),
+            sorted([
+                (long.pk, date(2024, 2, 12)),
+                (long.pk, date(2024, 2, 19)),
+                (planned.pk, date(2024, 2, 12)),
+            ]),
+        )
+
+        url = "/zivinetz/admin/groups/2024-02-12/?scope_statement=%s" % (
+            short.specification.scope_statement_id
+        )
+        response = self.client.post(url, {"copy_forward": "1"})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(
+            get_messages(self.client.get(url)),
+            ["Copied 0 group assignments into the following weeks."],
+        )
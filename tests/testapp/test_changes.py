@@ -1,9 +1,12 @@
-from datetime import date
+from datetime import date, timedelta
 
+from django.db import connection
+from django.db.models import F, Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from testapp import factories
-from zivinetz.models import AssignmentChange
+from zivinetz.models import Assignment, AssignmentChange, WeeklyOccupancy
 
 
 class ChangesTestCase(TestCase):
@@ -35,3 +38,210 @@ class ChangesTestCase(TestCase):
         self.assertContains(
             self.client.get("/zivinetz/reporting/assignmentchanges/"), "by unknown", 4
         )
+
+    def test_change_tracking_snapshot(self):
+        assignment = Assignment.objects.get(pk=factories.AssignmentFactory.create().pk)
+        drudge = factories.DrudgeFactory.create()
+
+        assignment.status = Assignment.ARRANGED
+        assignment.drudge = drudge
+        assignment.save()
+
+        change = AssignmentChange.objects.last()
+        self.assertIn("from tentative to arranged", change.changes)
+        self.assertIn(f"to {drudge}.", change.changes)
+        self.assertEqual(change.changed_by, "unknown")
+
+        # Saving again does not record the same changes twice
+        assignment.save()
+        self.assertEqual(AssignmentChange.objects.last().changes, "")
+
+    def test_change_tracking_deferred_fields(self):
+        pk = factories.AssignmentFactory.create().pk
+
+        assignment = Assignment.objects.only("id", "date_from").get(pk=pk)
+        assignment.status = Assignment.ARRANGED
+        assignment.save()
+        self.assertIn(
+            "from tentative to arranged", AssignmentChange.objects.last().changes
+        )
+
+        # Reloading some fields keeps the other changes made in memory
+        assignment = Assignment.objects.get(pk=pk)
+        assignment.status = Assignment.MOBILIZED
+        assignment.date_from += timedelta(days=7)
+        assignment.refresh_from_db(fields=["date_from"])
+        assignment.save()
+        self.assertIn(
+            "from arranged to mobilized", AssignmentChange.objects.last().changes
+        )
+
+    def test_change_tracking_update_fields(self):
+        assignment = factories.AssignmentFactory.create()
+        date_until = assignment.date_until
+
+        # Fields which are not saved are not recorded
+        assignment.status = Assignment.ARRANGED
+        assignment.date_until += timedelta(days=7)
+        assignment.save(update_fields=["status"])
+        change = AssignmentChange.objects.last().changes
+        self.assertIn("from tentative to arranged", change)
+        self.assertNotIn("date until", change)
+
+        # ... but when they are saved later
+        assignment.save()
+        self.assertIn(
+            f"from {date_until} to {assignment.date_until}",
+            AssignmentChange.objects.last().changes,
+        )
+
+    def test_weekly_occupancy_rebuild(self):
+        assignment = factories.AssignmentFactory.create()
+
+        def occupancy():
+            return list(
+                WeeklyOccupancy.objects
+                .filter(assignment=assignment)
+                .order_by("week")
+                .values_list("pk", "week", "days")
+            )
+
+        rows = occupancy()
+        self.assertTrue(rows)
+
+        # Fields the occupancy does not depend on keep the rows
+        assignment.status = Assignment.ARRANGED
+        assignment.arranged_on = date.today()
+        assignment.save()
+        self.assertEqual(occupancy(), rows)
+
+        # Unsaved changes are ignored too
+        assignment.date_until += timedelta(days=7)
+        assignment.save(update_fields=["status"])
+        self.assertEqual(occupancy(), rows)
+
+        assignment.save()
+        self.assertEqual(len(occupancy()), len(rows) + 1)
+
+    def test_collect_changes(self):
+        assignments = [factories.AssignmentFactory.create() for _i in range(3)]
+        AssignmentChange.objects.all().delete()
+
+        with (
+            CaptureQueriesContext(connection) as queries,
+            AssignmentChange.objects.collect(),
+        ):
+            for assignment in assignments:
+                assignment.status = Assignment.DECLINED
+                assignment.save()
+            assignments[0].delete()
+
+        self.assertEqual(
+            sum(
+                query["sql"].startswith('INSERT INTO "zivinetz_assignmentchange"')
+                for query in queries.captured_queries
+            ),
+            1,
+        )
+        self.assertEqual(AssignmentChange.objects.count(), 4)
+        self.assertEqual(
+            AssignmentChange.objects.filter(assignment__isnull=True).count(), 2
+        )
+
+    def test_audited_bulk_operations(self):
+        assignments = [factories.AssignmentFactory.create() for _i in range(3)]
+        AssignmentChange.objects.all().delete()
+
+        def total_days():
+            return WeeklyOccupancy.objects.aggregate(days=Sum("days"))["days"]
+
+        days = total_days()
+        queryset = Assignment.objects.filter(pk__in=[a.pk for a in assignments[:2]])
+        # Savepoint, SELECT, UPDATE, INSERT, release savepoint
+        with self.assertNumQueries(5):
+            self.assertEqual(queryset.update(status=Assignment.ARRANGED), 2)
+        self.assertEqual(
+            list(AssignmentChange.objects.values_list("assignment", "changes")),
+            [
+                (
+                    assignment.pk,
+                    (
+                        "The value of `status` has been changed from tentative"
+                        " to arranged."
+                    ),
+                )
+                for assignment in sorted(
+                    assignments[:2],
+                    key=lambda a: (a.date_from, a.date_until),
+                    reverse=True,
+                )
+            ],
+        )
+
+        # Unchanged rows are not recorded
+        queryset.update(status=Assignment.ARRANGED)
+        self.assertEqual(AssignmentChange.objects.count(), 2)
+
+        queryset.update(date_until=F("date_until") + timedelta(days=7))
+        self.assertEqual(AssignmentChange.objects.count(), 4)
+        self.assertEqual(total_days(), days + 14)
+
+        assignment = assignments[2]
+        assignment.status = Assignment.MOBILIZED
+        assignment.mobilized_on = date.today()
+        Assignment.objects.bulk_update([assignment], ["status", "mobilized_on"])
+        self.assertEqual(AssignmentChange.objects.count(), 5)
+        self.assertEqual(AssignmentChange.objects.last().changes.count("\n"), 1)
+
+        (created,) = Assignment.objects.bulk_create([
+            Assignment(
+                specification=assignment.specification,
+                drudge=assignment.drudge,
+                regional_office=assignment.regional_office,
+                date_from=date(2024, 1, 1),
+                date_until=date(2024, 1, 14),
+            )
+        ])
+        self.assertEqual(
+            AssignmentChange.objects.last().changes, "Assignment has been created."
+        )
+        self.assertEqual(WeeklyOccupancy.objects.filter(assignment=created).count(), 2)
+
+        # Rows updated on conflict are recorded as changes
+        AssignmentChange.objects.all().delete()
+        created.date_until = date(2024, 1, 21)
+        created.status = Assignment.ARRANGED
+        (updated, new) = Assignment.objects.bulk_create(
+            [
+                created,
+                Assignment(
+                    specification=assignment.specification,
+                    drudge=assignment.drudge,
+                    regional_office=assignment.regional_office,
+                    date_from=date(2024, 3, 1),
+                    date_until=date(2024, 3, 14),
+                ),
+            ],
+            update_conflicts=True,
+            update_fields=["date_until"],
+            unique_fields=["id"],
+        )
+        self.assertEqual(updated.pk, created.pk)
+        self.assertEqual(
+            list(
+                AssignmentChange.objects.order_by("pk").values_list(
+                    "assignment", "changes"
+                )
+            ),
+            [
+                (
+                    created.pk,
+                    (
+                        "The value of `date until` has been changed from"
+                        " 2024-01-14 to 2024-01-21."
+                    ),
+                ),
+                (new.pk, "Assignment has been created."),
+            ],
+        )
+        self.assertEqual(WeeklyOccupancy.objects.filter(assignment=created).count(), 3)
@@ -1,12 +1,18 @@
 import os
 from datetime import date, timedelta
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.test import TestCase
+from django.utils import timezone
+from pypdf import PdfReader
 
 from testapp import factories
+from testapp.utils import temporary_private_root
 from zivinetz.models import Assignment, AssignmentChange, UserProfile
+from zivinetz.views.reporting import EIV_TEMPLATE, parsed_pdf
 
 
 class DrudgeViewsTestCase(TestCase):
@@ -77,6 +83,7 @@ class DrudgeViewsTestCase(TestCase):
         self.assertRedirects(self.client.get("/zivinetz/"), "/zivinetz/dashboard/")
 
     def test_create_assignment_as_drudge(self):
+        temporary_private_root(self)
         drudge = factories.DrudgeFactory.create()
         self.client.login(username=drudge.user.username, password="test")
 
@@ -113,7 +120,58 @@ class DrudgeViewsTestCase(TestCase):
             response["content-disposition"],
             f"attachment; filename=eiv-{assignment.pk}.pdf",
         )
-        self.assertTrue(len(response.content))
+        content = b"".join(response.streaming_content)
+        self.assertEqual(len(PdfReader(BytesIO(content)).pages), 3)
+
+        # The template is only parsed once
+        self.assertIs(parsed_pdf(EIV_TEMPLATE), parsed_pdf(EIV_TEMPLATE))
+
+        # The rendered PDF is cached and revalidated using its ETag or the
+        # time it has been rendered
+        response = self.client.get(assignment.pdf_url())
+        self.assertEqual(b"".join(response.streaming_content), content)
+        last_modified = response["last-modified"]
+        response = self.client.get(
+            assignment.pdf_url(), headers={"if-none-match": response["etag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            assignment.pdf_url(), headers={"if-modified-since": last_modified}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["last-modified"], last_modified)
+
+        # Changes to the rendering code invalidate the cached PDFs
+        etag = response["etag"]
+        with mock.patch("zivinetz.utils.pdf_cache.PDF_RENDER_VERSION", -1):
+            response = self.client.get(
+                assignment.pdf_url(), headers={"if-none-match": etag}
+            )
+        self.assertEqual(response.status_code, 200)
+
+        # Logging in does not change the PDF
+        assignment.drudge.user.last_login = timezone.now()
+        assignment.drudge.user.save()
+        response = self.client.get(
+            assignment.pdf_url(), headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        assignment.drudge.user.last_name = "Changed"
+        assignment.drudge.user.save()
+        response = self.client.get(assignment.pdf_url())
+        self.assertNotEqual(b"".join(response.streaming_content), content)
+
+        # If-Modified-Since is ignored when If-None-Match does not match
+        response = self.client.get(
+            assignment.pdf_url(),
+            headers={
+                "if-none-match": etag,
+                "if-modified-since": response["last-modified"],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(b"".join(response.streaming_content), content)
 
         # Fast forward a bit.
         assignment.arranged_on = assignment.mobilized_on = date.today()
@@ -128,4 +186,4 @@ class DrudgeViewsTestCase(TestCase):
             response["content-disposition"],
             'attachment; filename="expense-report-%d.pdf"' % report.id,
         )
-        self.assertTrue(len(response.content))
+        self.assertTrue(len(b"".join(response.streaming_content)))
@@ -1,10 +1,17 @@
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 
 from testapp import factories
-from zivinetz.models import AssignmentChange, CompensationSet, ScopeStatement
+from zivinetz.middleware import override_current_request
+from zivinetz.models import (
+    Assignment,
+    AssignmentChange,
+    CompensationSet,
+    ExpenseReport,
+    ScopeStatement,
+)
 from zivinetz.utils.holidays import get_public_holidays
 
 
@@ -287,3 +294,158 @@ class ExampleAssignmentsTestCase(TestCase):
                 for s in ["273.7", "627.4", "327.3", "480", "297.1", "239", "258.5"]
             ],
         )
+
+    def test_assignment_days_extension(self):
+        factories.PublicHolidayFactory.create(date=date(2014, 10, 2), name="Test")
+
+        assignment = factories.AssignmentFactory.create(
+            specification=self._generate_pa_specification(),
+            date_from=date(2014, 9, 8),
+            date_until=date(2014, 10, 3),
+            date_until_extension=date(2014, 10, 17),
+        )
+
+        cf = factories.CompanyHolidayFactory.create(
+            date_from=date(2014, 10, 9), date_until=date(2014, 10, 14)
+        )
+        cf.applies_to.set(ScopeStatement.objects.all())
+
+        days, monthly_expense_days = assignment.assignment_days()
+
+        self.assertEqual(days["assignment_days"], 26)
+        self.assertEqual(days["company_holidays"], 6)
+        self.assertEqual(days["forced_leave_days"], 4)
+        self.assertEqual(days["working_days"], 25)
+        self.assertEqual(days["countable_days"], 36)
+        self.assertEqual(
+            [
+                (
+                    month,
+                    (data["start"], data["end"]),
+                    [data[key] for key in ("working", "free", "holi", "forced")],
+                )
+                for month, data in monthly_expense_days
+            ],
+            [
+                ((2014, 9, 8), (date(2014, 9, 8), date(2014, 9, 30)), [17, 6, 0, 0]),
+                ((2014, 10, 1), (date(2014, 10, 1), date(2014, 10, 3)), [2, 1, 0, 0]),
+                ((2014, 10, 4), (date(2014, 10, 4), date(2014, 10, 17)), [6, 4, 0, 4]),
+            ],
+        )
+
+    def test_active_range(self):
+        extended = factories.AssignmentFactory.create(
+            date_from=date(2014, 9, 8),
+            date_until=date(2014, 10, 3),
+            date_until_extension=date(2014, 10, 17),
+        )
+        plain = factories.AssignmentFactory.create(
+            date_from=date(2014, 10, 6), date_until=date(2014, 10, 31)
+        )
+        # Inconsistent dates must not break saving
+        factories.AssignmentFactory.create(
+            date_from=date(2014, 10, 10), date_until=date(2014, 10, 1)
+        )
+
+        def ids(queryset):
+            return sorted(queryset.values_list("id", flat=True))
+
+        self.assertEqual(
+            ids(Assignment.objects.for_date(date(2014, 9, 8))), [extended.id]
+        )
+        self.assertEqual(
+            ids(Assignment.objects.for_date(date(2014, 10, 17))),
+            sorted([extended.id, plain.id]),
+        )
+        self.assertEqual(
+            ids(Assignment.objects.for_date(date(2014, 10, 20))), [plain.id]
+        )
+        self.assertEqual(
+            ids(Assignment.objects.overlapping(date(2014, 9, 1), date(2014, 9, 30))),
+            [extended.id],
+        )
+        self.assertEqual(
+            ids(Assignment.objects.filter(pk=plain.pk).overlapping(date(2014, 10, 31))),
+            [plain.id],
+        )
+        self.assertEqual(ids(Assignment.objects.overlapping(date(2014, 11, 1))), [])
+
+    def test_generate_for_assignments(self):
+        self._generate_compensation_sets()
+
+        specification = self._generate_pa_specification()
+        for date_from in (date(2014, 9, 8), date(2014, 11, 3), date(2015, 1, 5)):
+            factories.AssignmentFactory.create(
+                specification=specification,
+                date_from=date_from,
+                date_until=date_from + timedelta(days=60),
+                arranged_on=date(2014, 1, 29),
+            )
+
+        assignments = Assignment.objects.select_related("specification")
+        with self.assertNumQueries(6):
+            created = ExpenseReport.objects.generate_for_assignments(assignments)
+        self.assertEqual(created, 9)
+        self.assertEqual(ExpenseReport.objects.count(), 9)
+        self.assertEqual(ExpenseReport.objects.generate_for_assignments(assignments), 0)
+
+        report = ExpenseReport.objects.get(date_from=date(2014, 9, 8))
+        total = report.total
+        report.recalculate_total()
+        self.assertEqual(report.total, total)
+
+    def test_compensation_set_index(self):
+        self._generate_compensation_sets()
+
+        # Outside of requests every call loads the current rows
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                CompensationSet.objects.for_date(date(2005, 1, 1)).valid_from,
+                date(2000, 1, 1),
+            )
+
+        with override_current_request(RequestFactory().get("/")):
+            self.assertEqual(
+                CompensationSet.objects.for_date(date(2005, 1, 1)).valid_from,
+                date(2000, 1, 1),
+            )
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    CompensationSet.objects.for_date(date(2011, 2, 1)).valid_from,
+                    date(2011, 2, 1),
+                )
+                with self.assertRaises(CompensationSet.DoesNotExist):
+                    CompensationSet.objects.for_date(date(1999, 12, 31))
+
+            # Changes drop the index of the request
+            CompensationSet.objects.get(valid_from=date(2000, 1, 1)).delete()
+            with self.assertRaises(CompensationSet.DoesNotExist):
+                CompensationSet.objects.for_date(date(2005, 1, 1))
+
+        # Other requests load their own index
+        with (
+            override_current_request(RequestFactory().get("/")),
+            self.assertNumQueries(1),
+        ):
+            CompensationSet.objects.for_date(date(2011, 2, 1))
+
+    def test_compensation_table(self):
+        self._generate_compensation_sets()
+        specification = self._generate_pa_specification()
+
+        table = specification.compensation_table(date(2014, 1, 1))
+        self.assertIs(specification.compensation_table(date(2014, 2, 1)), table)
+        self.assertEqual(specification.compensation(date(2014, 1, 1)), table.rates)
+        self.assertEqual(
+            table.daily["working"],
+            sum(
+                table.rates[f"{kind}_working"]
+                for kind in ("accomodation", "breakfast", "lunch", "supper")
+            ),
+        )
+        with self.assertRaises(TypeError):
+            table.rates["spending_money"] = Decimal("0.00")
+
+        # Tables are keyed by value; a changed specification gets a new one
+        specification.lunch_working = "at_accomodation"
+        self.assertIsNot(specification.compensation_table(date(2014, 1, 1)), table)
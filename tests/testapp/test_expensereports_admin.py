@@ -1,11 +1,11 @@
 from datetime import date
 from decimal import Decimal
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from testapp import factories
 from testapp.utils import admin_login, get_messages, model_to_postable_dict
-from zivinetz.models import Assignment, CompensationSet, ExpenseReport
+from zivinetz.models import Absence, Assignment, CompensationSet, ExpenseReport
 
 
 class ExpenseReportsAdminViewsTestCase(TestCase):
@@ -123,6 +123,7 @@ class ExpenseReportsAdminViewsTestCase(TestCase):
             self.assertEqual(getattr(report, type), days)
         self.assertEqual(report.calculated_total_days, 26)
 
+    @override_settings(ZIVINETZ_SEARCH_BACKEND="document")
     def test_transport_expenses_copying(self):
         factories.CompensationSetFactory.create()
         factories.AssignmentFactory.create(
@@ -163,3 +164,66 @@ class ExpenseReportsAdminViewsTestCase(TestCase):
             [r.transport_expenses_notes for r in ExpenseReport.objects.all()],
             ["", "Auto-Dumm", "Auto-Dumm"],
         )
+
+        reports = list(
+            ExpenseReport.objects.select_related("assignment", "specification")
+        )
+        totals = [report.total for report in reports]
+        # Compensation sets (not cached inside this transaction) and UPDATE
+        with self.assertNumQueries(2):
+            ExpenseReport.objects.recalculate_totals(reports)
+        self.assertEqual([report.total for report in reports], totals)
+
+        self.assertEqual(ExpenseReport.objects.search("dumm").count(), 2)
+
+    def test_absences_for_expense_reports(self):
+        factories.CompensationSetFactory.create()
+        assignment, other_assignment = (
+            factories.AssignmentFactory.create(
+                date_from=date(2024, 1, 8), date_until=date(2024, 3, 1)
+            )
+            for _i in range(2)
+        )
+        assignment.generate_expensereports()
+        other_assignment.generate_expensereports()
+
+        january, february, _march = assignment.reports.order_by("date_from")
+        other = other_assignment.reports.get(date_from=date(2024, 2, 1))
+
+        assignment.absences.create(
+            created_by=assignment.drudge.user,
+            reason=Absence.SICK,
+            internal_notes="Flu",
+            days=[date(2024, 2, 1), date(2024, 1, 30), date(2024, 1, 31)],
+        )
+        assignment.absences.create(
+            created_by=assignment.drudge.user,
+            reason=Absence.APPROVED_HOLIDAY,
+            days=[date(2024, 2, 12), date(2024, 2, 13)],
+        )
+
+        with self.assertNumQueries(1):
+            absences = Absence.objects.for_expense_reports([
+                january,
+                february,
+                other,
+            ])
+
+        # The last day of the expense report is not counted
+        self.assertEqual(
+            absences[january.pk],
+            {"sick_days": 1, "sick_days_notes": "sick (Flu): Tue 30.01.24"},
+        )
+        self.assertEqual(
+            absences[february.pk],
+            {
+                "sick_days": 1,
+                "sick_days_notes": "sick (Flu): Thu 01.02.24",
+                "holi_days": 2,
+                "holi_days_notes": "approved holiday: Mon 12.02.24, Tue 13.02.24",
+            },
+        )
+        self.assertEqual(absences[other.pk], {})
+        self.assertEqual(
+            Absence.objects.for_expense_report(february), absences[february.pk]
+        )
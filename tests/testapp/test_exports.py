@@ -0,0 +1,138 @@
+import io
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from testapp import factories
+from testapp.utils import admin_login, temporary_private_root
+from zivinetz.models import ExportJob
+
+
+class ExportJobsTestCase(TransactionTestCase):
+    # The worker closes obsolete database connections after each job, which
+    # is not possible inside the transaction of a TestCase
+    def test_background_exports(self):
+        root = temporary_private_root(self)
+        admin_login(self)
+        self.admin.userprofile.user_type = "dev_admin"
+        self.admin.userprofile.save()
+        factories.AssignmentFactory.create()
+        session = self.client.session
+        session["sf_zivinetz.forms.DrudgeSearchForm"] = "only_active=on"
+        session["unrelated"] = "secret"
+        session.save()
+
+        for url, language in [
+            ("/zivinetz/admin/drudges/pdf/?background=1", "en"),
+            (
+                "/zivinetz/admin/assignments/pdf/?active_on=yesterday&background=1",
+                "de",
+            ),
+            ("/zivinetz/admin/groups/2024-01-01/?xlsx=1&background=1", "en"),
+        ]:
+            self.assertRedirects(
+                self.client.get(url, headers={"accept-language": language}),
+                reverse("zivinetz_exportjob_list"),
+            )
+
+        drudges, assignments, groups = ExportJob.objects.order_by("pk")
+        self.assertEqual(drudges.query, "")
+        self.assertEqual(
+            drudges.session, {"sf_zivinetz.forms.DrudgeSearchForm": "only_active=on"}
+        )
+        self.assertEqual(assignments.query, "active_on=yesterday")
+        self.assertEqual(assignments.language, "de")
+        self.assertEqual(groups.title, "Wochenrapport 2024-01-01")
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command("run_export_jobs", once=True, stdout=io.StringIO())
+
+        drudges.refresh_from_db()
+        self.assertEqual(drudges.status, ExportJob.FINISHED)
+        self.assertEqual(drudges.session, {})
+        response = self.client.get(drudges.get_absolute_url())
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+        groups.refresh_from_db()
+        self.assertEqual(groups.status, ExportJob.FINISHED)
+        self.assertTrue(groups.file.name.endswith("/wochenrapport-2024-01-01.xlsx"))
+
+        assignments.refresh_from_db()
+        self.assertEqual(assignments.status, ExportJob.FAILED)
+        # Exports are created in the language of the request which queued them
+        self.assertEqual(assignments.error, "Die Suchanfrage war ungültig.")
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, [self.admin.email])
+        self.assertIn(
+            f"http://testserver{drudges.get_absolute_url()}", mail.outbox[0].body
+        )
+
+        self.assertContains(
+            self.client.get(reverse("zivinetz_exportjob_list")),
+            "Die Suchanfrage war ungültig.",
+        )
+
+        self.client.force_login(factories.UserFactory.create(is_staff=True))
+        self.assertEqual(self.client.get(drudges.get_absolute_url()).status_code, 404)
+
+        self.assertTrue(os.path.exists(drudges.file.path))
+        self.assertTrue(drudges.file.path.startswith(root))
+        ExportJob.objects.filter(pk=drudges.pk).update(
+            created_at=timezone.now() - timedelta(days=15)
+        )
+        call_command("prune_export_jobs", stdout=io.StringIO())
+        self.assertEqual(ExportJob.objects.count(), 2)
+        self.assertFalse(os.path.exists(os.path.dirname(drudges.file.path)))
+
+    def test_stale_export_jobs(self):
+        user = factories.UserFactory.create(is_staff=True)
+        stale, running = (
+            ExportJob.objects.create(
+                created_by=user,
+                title=title,
+                status=ExportJob.RUNNING,
+                started_at=timezone.now() - timedelta(minutes=minutes),
+            )
+            for title, minutes in [("stale", 90), ("running", 10)]
+        )
+
+        call_command("run_export_jobs", once=True, stdout=io.StringIO())
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ExportJob.FAILED)
+        self.assertEqual(stale.error, "The export has been interrupted.")
+        running.refresh_from_db()
+        self.assertEqual(running.status, ExportJob.RUNNING)
+        self.assertEqual(
+            [message.subject for message in mail.outbox], ["Export stale failed"]
+        )
+
+    def test_failed_export_jobs(self):
+        user = factories.UserFactory.create(is_staff=True)
+        job = ExportJob.objects.create(
+            created_by=user, title="broken", path="/zivinetz/admin/drudges/pdf/"
+        )
+
+        with (
+            mock.patch(
+                "zivinetz.utils.exports.render_export",
+                side_effect=RuntimeError("Secret details"),
+            ),
+            self.assertLogs("zivinetz.utils.exports", "ERROR") as logs,
+        ):
+            call_command("run_export_jobs", once=True, stdout=io.StringIO())
+
+        # The traceback is logged but not shown to the user
+        self.assertIn("Secret details", logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.FAILED)
+        self.assertEqual(
+            job.error, "The export could not be created because of an error."
+        )
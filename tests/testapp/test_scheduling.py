@@ -1,7 +1,13 @@
-from django.test import TestCase
+import io
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
 
 from testapp import factories
-from zivinetz.models import Assignment
+from zivinetz.models import Assignment, DrudgeQuota, WeeklyOccupancy
+from zivinetz.utils.weeks import calendar_week, week_mondays
+from zivinetz.views.scheduling import Scheduler, SchedulingSearchForm
 
 
 class SchedulingTestCase(TestCase):
@@ -20,3 +26,133 @@ class SchedulingTestCase(TestCase):
         self.assertEqual(
             self.client.get("/zivinetz/admin/scheduling/").status_code, 200
         )
+
+    def test_search_form_date_range(self):
+        assignments = [
+            factories.AssignmentFactory.create(
+                date_from=date_from, date_until=date_from + timedelta(days=27)
+            )
+            for date_from in (date(2024, 1, 1), date(2024, 3, 1), date(2024, 5, 1))
+        ]
+        request = RequestFactory().get(
+            "/", {"date_until__gte": "2024-02-01", "date_from__lte": "2024-03-01"}
+        )
+        form = SchedulingSearchForm(request.GET, request=request)
+        form.is_valid()
+        queryset = form.queryset()
+
+        self.assertEqual(list(queryset), [assignments[1]])
+        # One range lookup instead of two date comparisons
+        sql = str(queryset.query)
+        self.assertIn("&&", sql)
+        self.assertNotIn('"date_from" <=', sql)
+
+    def test_quota_year(self):
+        admin = factories.UserFactory.create(is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        first, second = factories.ScopeStatementFactory.create_batch(2)
+        weeks = week_mondays(date(2024, 1, 1), date(2024, 1, 15))
+
+        DrudgeQuota.objects.create(scope_statement=first, week=weeks[0], quota=3)
+        DrudgeQuota.objects.create(scope_statement=first, week=weeks[1], quota=5)
+        DrudgeQuota.objects.create(scope_statement=second, week=weeks[0], quota=2)
+
+        url = "/zivinetz/admin/scheduling/quotas/2024/"
+        response = self.client.get(url)
+        self.assertContains(response, 'name="%s_20240108-quota" value="5"' % first.pk)
+
+        def field(scope_statement, week):
+            return "{}_{}-quota".format(scope_statement.pk, week.strftime("%Y%m%d"))
+
+        response = self.client.post(
+            url,
+            {
+                field(first, weeks[0]): "4",
+                field(first, weeks[1]): "",
+                field(second, weeks[0]): "2",
+                field(second, weeks[2]): "7",
+            },
+        )
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(DrudgeQuota.objects.values_list("scope_statement", "week", "quota")),
+            sorted([
+                (first.pk, weeks[0], 4),
+                (second.pk, weeks[0], 2),
+                (second.pk, weeks[2], 7),
+            ]),
+        )
+        self.assertContains(
+            self.client.get(url), "Created 1, updated 1, deleted 1 quotas"
+        )
+
+        response = self.client.post(
+            url,
+            {field(first, weeks[0]): "abc", field(second, weeks[0]): "101"},
+        )
+        self.assertContains(response, "Please correct the highlighted quotas.")
+        self.assertContains(response, '<td class="invalid">', 2)
+        self.assertContains(response, 'name="%s" value="abc"' % field(first, weeks[0]))
+        self.assertEqual(DrudgeQuota.objects.count(), 3)
+
+    def test_scheduler(self):
+        first = factories.AssignmentFactory.create(
+            date_from=date(2024, 1, 3),
+            date_until=date(2024, 1, 19),
+            environment_course_date=date(2024, 1, 10),
+        )
+        factories.AssignmentFactory.create(
+            date_from=date(2024, 1, 8), date_until=date(2024, 3, 1)
+        )
+
+        scheduler = Scheduler(
+            Assignment.objects.all(), (date(2024, 1, 1), date(2024, 2, 4))
+        )
+        scheduler.add_quotas(with_accomodation=None, scope_statements=None)
+        assignments = scheduler.assignments()
+
+        self.assertEqual([week[2] for week in scheduler.weeks()], [1, 2, 3, 4, 5])
+        self.assertEqual(
+            assignments[0],
+            (
+                first,
+                [
+                    ["", "", None],
+                    ["a c-una", "", "2024-01-10 (Start: Wednesday 10.01.)"],
+                    ["a", 19, None],
+                    ["", "", None],
+                    ["", "", None],
+                ],
+            ),
+        )
+        self.assertEqual(
+            [count for _class, count, _title in scheduler.head[1][1]],
+            [1, 1, 2, 1, 1],
+        )
+        self.assertAlmostEqual(scheduler.average, 45 / 34)
+
+        WeeklyOccupancy.objects.all().delete()
+        call_command("rebuild_weekly_occupancy", stdout=io.StringIO())
+        self.assertEqual(
+            sorted(WeeklyOccupancy.objects.values_list("week", "days")),
+            [
+                (date(2024, 1, 1), 5),
+                (date(2024, 1, 8), 7),
+                (date(2024, 1, 8), 7),
+                (date(2024, 1, 15), 5),
+                *((date(2024, 1, 15) + timedelta(days=7 * i), 7) for i in range(6)),
+                (date(2024, 2, 26), 5),
+            ],
+        )
+
+    def test_calendar_week(self):
+        self.assertEqual(calendar_week(date(2024, 12, 30)), (2025, 1))
+        self.assertEqual(calendar_week(date(2021, 1, 3)), (2020, 53))
+        # Leap year beginning on a thursday
+        self.assertEqual(calendar_week(date(2004, 12, 31)), (2004, 53))
+        self.assertEqual(calendar_week(date(2005, 1, 2)), (2004, 53))
+
+        self.assertEqual(
+            week_mondays(date(2024, 1, 3), date(2024, 1, 15)),
+            [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)],
+        )
@@ -1,6 +1,9 @@
+import shutil
+import tempfile
 from datetime import date, datetime
 
 from django.forms.models import model_to_dict
+from django.test import override_settings
 
 from testapp import factories
 from zivinetz.models import UserProfile
@@ -26,3 +29,13 @@ def admin_login(testcase):
         # Create UserProfile with admin type
         UserProfile.objects.create(user=testcase.admin, user_type="admin")
     testcase.client.force_login(testcase.admin)
+
+
+def temporary_private_root(testcase):
+    """Writes exports and cached PDFs into a directory removed after the test"""
+    root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    override = override_settings(ZIVINETZ_PRIVATE_ROOT=root)
+    override.enable()
+    testcase.addCleanup(override.disable)
+    return root
@@ -1,6 +1,7 @@
 from datetime import date, timedelta
 
 from django import forms
+from django.db import transaction
 from django.db.models import Avg, Q
 from django.utils.translation import gettext_lazy as _
 from towel.forms import SearchForm, WarningsForm
@@ -34,19 +35,16 @@ def add_last_assignment_and_mark(queryset):
         if mark["mark__avg"]:
             drudges[mark["drudge"]].average_mark = "%.2f" % mark["mark__avg"]
 
+    # DISTINCT ON returns the first row per drudge, that is the latest
+    # assignment of every drudge on this page
     for assignment in (
         Assignment.objects
+        .filter(drudge__in=drudges.keys())
         .select_related("specification__scope_statement")
-        .order_by("-date_from")
-        .iterator()
+        .order_by("drudge_id", "-date_from")
+        .distinct("drudge_id")
     ):
-        if assignment.drudge_id in drudges:
-            drudges[assignment.drudge_id].last_assignment = assignment
-            del drudges[assignment.drudge_id]
-
-        if not drudges:
-            # All drudges have a last assignment now
-            break
+        drudges[assignment.drudge_id].last_assignment = assignment
 
 
 class SpecificationForm(forms.ModelForm):
@@ -209,21 +207,7 @@ class AssignmentSearchForm(SearchForm):
         )
 
         if data.get("active_on"):
-            active_on = data.get("active_on")
-
-            queryset = queryset.filter(
-                Q(date_from__lte=active_on)
-                & (
-                    (
-                        Q(date_until_extension__isnull=True)
-                        & Q(date_until__gte=active_on)
-                    )
-                    | Q(
-                        date_until_extension__isnull=False,
-                        date_until_extension__gte=active_on,
-                    )
-                )
-            )
+            queryset = queryset.filter(active_range__contains=data.get("active_on"))
 
         if data.get("service_between") and data.get("service_and"):
             queryset = queryset.filter(
@@ -364,6 +348,32 @@ class TableCellRadioSelect(forms.RadioSelect):
         return context
 
 
+class GroupReportsForm(forms.Form):
+    date_from = forms.DateField(
+        label=_("date from"), widget=forms.DateInput(attrs={"class": "dateinput"})
+    )
+    date_until = forms.DateField(
+        label=_("date until"), widget=forms.DateInput(attrs={"class": "dateinput"})
+    )
+    scope_statements = forms.ModelMultipleChoiceField(
+        queryset=ScopeStatement.objects.filter(is_active=True),
+        label=_("scope statements"),
+        required=False,
+        help_text=_("Creates a sheet per week and scope statement."),
+    )
+
+    def clean(self):
+        data = super().clean()
+        if data.get("date_from") and data.get("date_until"):
+            if data["date_from"] > data["date_until"]:
+                raise forms.ValidationError(_("The date range is invalid."))
+            if (data["date_until"] - data["date_from"]).days > 366:
+                raise forms.ValidationError(
+                    _("At most one year can be exported at once.")
+                )
+        return data
+
+
 class AssignDrudgesToGroupsForm(forms.Form):
     def __init__(self, *args, **kwargs):
         self.day = GroupAssignment.objects.monday(
@@ -373,11 +383,12 @@ class AssignDrudgesToGroupsForm(forms.Form):
 
         super().__init__(*args, **kwargs)
 
-        assignments = dict(
+        self.current_groups = dict(
             GroupAssignment.objects.for_date(self.day).values_list(
                 "assignment", "group"
             )
         )
+        assignments = self.current_groups
         if not assignments:
             # Read defaults from last week
             assignments = dict(
@@ -393,13 +404,20 @@ class AssignDrudgesToGroupsForm(forms.Form):
             self.assignments = self.assignments.filter(
                 specification__scope_statement=self.scope_statement
             )
+        self.assignments = list(
+            self.assignments.select_related(
+                "specification__scope_statement", "drudge__user"
+            )
+        )
 
-        for asg in self.assignments.select_related(
-            "specification__scope_statement", "drudge__user"
-        ):
-            self.fields["asg_%s" % asg.id] = f = forms.ModelChoiceField(
+        for asg in self.assignments:
+            # Group IDs instead of a ModelChoiceField so that validation does
+            # not run a query per assignment
+            self.fields["asg_%s" % asg.id] = forms.TypedChoiceField(
                 label=str(asg),
-                queryset=Group.objects.active(),
+                choices=self.group_choices,
+                coerce=int,
+                empty_value=None,
                 initial=(
                     assignments.get(asg.id)
                     or asg.specification.scope_statement.default_group_id
@@ -407,15 +425,34 @@ class AssignDrudgesToGroupsForm(forms.Form):
                 widget=TableCellRadioSelect,
                 required=False,
             )
-            f.choices = self.group_choices
 
     def save(self):
-        for asg in self.assignments:
-            group = self.cleaned_data["asg_%s" % asg.id]
+        """
+        Applies the differences to the group assignments of the week using a
+        single upsert and a single delete
+        """
+        groups = {
+            asg.id: self.cleaned_data["asg_%s" % asg.id] for asg in self.assignments
+        }
+
+        with transaction.atomic():
+            GroupAssignment.objects.bulk_create(
+                [
+                    GroupAssignment(assignment_id=asg, group_id=group, week=self.day)
+                    for asg, group in groups.items()
+                    if group and self.current_groups.get(asg) != group
+                ],
+                update_conflicts=True,
+                unique_fields=["assignment", "week"],
+                update_fields=["group"],
+            )
 
-            if group:
-                GroupAssignment.objects.update_or_create(
-                    assignment=asg, week=self.day, defaults={"group": group}
-                )
-            else:
-                GroupAssignment.objects.filter(assignment=asg, week=self.day).delete()
+            removed = [
+                asg
+                for asg, group in groups.items()
+                if not group and asg in self.current_groups
+            ]
+            if removed:
+                GroupAssignment.objects.filter(
+                    assignment__in=removed, week=self.day
+                ).delete()
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zivinetz.models import GroupAssignment
+
+
+class Command(BaseCommand):
+    help = "Copies the group assignments of a week into the following weeks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("week", type=date.fromisoformat)
+        parser.add_argument("weeks", type=int, help="Number of weeks to fill")
+
+    def handle(self, *args, **options):
+        if options["weeks"] < 1:
+            raise CommandError("The number of weeks has to be positive.")
+
+        created = GroupAssignment.objects.copy_forward(
+            options["week"], options["weeks"]
+        )
+        self.stdout.write("Created %s group assignments.\n" % created)
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zivinetz.models import ScopeStatement
+from zivinetz.views.groups import create_groups_range_xlsx
+
+
+class Command(BaseCommand):
+    help = "Writes the weekly group reports of a date range into a workbook"
+
+    def add_arguments(self, parser):
+        parser.add_argument("date_from", type=date.fromisoformat)
+        parser.add_argument("date_until", type=date.fromisoformat)
+        parser.add_argument("output", help="Path of the XLSX file to write")
+        parser.add_argument(
+            "--scope-statement",
+            dest="scope_statements",
+            action="append",
+            type=int,
+            default=[],
+            help="Create a sheet per week and scope statement (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        if options["date_from"] > options["date_until"]:
+            raise CommandError("The date range is invalid.")
+
+        scope_statements = list(
+            ScopeStatement.objects.filter(pk__in=options["scope_statements"])
+        )
+        if len(scope_statements) != len(set(options["scope_statements"])):
+            raise CommandError("Unknown scope statements.")
+
+        wb = create_groups_range_xlsx(
+            options["date_from"], options["date_until"], scope_statements
+        )
+        wb.save(options["output"])
+        self.stdout.write(
+            "Wrote %s sheets to %s.\n" % (len(wb.worksheets), options["output"])
+        )
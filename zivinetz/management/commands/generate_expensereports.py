@@ -1,14 +1,17 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Count
 
-from zivinetz.models import Assignment
+from zivinetz.models import Assignment, ExpenseReport
 
 
 class Command(BaseCommand):
     help = ""
 
     def handle(self, *args, **options):
-        for assignment in Assignment.objects.annotate(count=Count("reports")).filter(
-            count=0
-        ):
-            assignment.generate_expensereports()
+        created = ExpenseReport.objects.generate_for_assignments(
+            Assignment.objects
+            .annotate(count=Count("reports"))
+            .filter(count=0)
+            .select_related("specification")
+        )
+        self.stdout.write("Created %s expense reports.\n" % created)
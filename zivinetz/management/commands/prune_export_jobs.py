@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from zivinetz.utils.exports import RETENTION_DAYS, prune_export_jobs
+
+
+class Command(BaseCommand):
+    help = "Removes export jobs and their files which have been created a while ago"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=RETENTION_DAYS,
+            help=f"Remove jobs older than this many days (default: {RETENTION_DAYS})",
+        )
+
+    def handle(self, *args, **options):
+        count = prune_export_jobs(options["days"])
+        self.stdout.write(f"Removed {count} export jobs.\n")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from zivinetz.utils.pdf_cache import prune_pdf_cache
+
+
+class Command(BaseCommand):
+    help = "Removes cached PDFs which have been rendered a while ago"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Remove PDFs older than this many days (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        count = prune_pdf_cache(options["days"])
+        self.stdout.write(f"Removed {count} cached PDFs.\n")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from zivinetz.models import Assignment, Drudge, ExpenseReport, JobReference
+from zivinetz.utils.search import update_search_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search documents used by the document search backend"
+
+    def handle(self, *args, **options):
+        for model in (Drudge, Assignment, ExpenseReport, JobReference):
+            count = update_search_documents(model._base_manager.all(), force=True)
+            self.stdout.write(
+                f"Updated {count} {model._meta.verbose_name_plural} search documents.\n"
+            )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from zivinetz.models import Assignment, WeeklyOccupancy
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the weekly occupancy table used by the scheduler"
+
+    def handle(self, *args, **options):
+        created = 0
+        assignments = Assignment.objects.only(
+            "drudge", "date_from", "date_until", "date_until_extension"
+        ).order_by("pk")
+
+        with transaction.atomic():
+            WeeklyOccupancy.objects.all().delete()
+            batch = []
+            for assignment in assignments.iterator(chunk_size=1000):
+                batch.append(assignment)
+                if len(batch) >= 1000:
+                    created += WeeklyOccupancy.objects.rebuild(batch)
+                    batch = []
+            created += WeeklyOccupancy.objects.rebuild(batch)
+
+        self.stdout.write("Created %s weekly occupancy rows.\n" % created)
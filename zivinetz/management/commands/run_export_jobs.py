@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from zivinetz.models import ExportJob
+from zivinetz.utils.exports import (
+    STALE_MINUTES,
+    fail_stale_export_jobs,
+    run_export_job,
+)
+
+
+class Command(BaseCommand):
+    help = "Creates exports which have been queued to run in the background"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as there are no pending exports left",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls for new exports (default: 5)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=STALE_MINUTES,
+            help=(
+                "Mark exports which are running for longer than this many"
+                f" minutes as failed (default: {STALE_MINUTES})"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for job in fail_stale_export_jobs(options["timeout"]):
+                self.stdout.write(f"{job}: {job.get_status_display()}\n")
+
+            job = ExportJob.objects.claim()
+            if job is not None:
+                run_export_job(job)
+                self.stdout.write(f"{job}: {job.get_status_display()}\n")
+
+            # Don't keep broken or obsolete connections around, same as
+            # Django does at the start and end of every request
+            close_old_connections()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current_request = ContextVar("zivinetz_current_request", default=None)
+
+
+def current_request():
+    """Returns the request currently processed by this context, if any"""
+    return _current_request.get()
+
+
+@contextmanager
+def override_current_request(request):
+    """Makes ``request`` the current request inside the block"""
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+def CurrentRequestMiddleware(get_response):
+    """
+    Makes the request available to code without access to it, e.g. the
+    assignment change tracking signal handlers
+    """
+
+    def fn(request):
+        with override_current_request(request):
+            return get_response(request)
+
+    return fn
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def week_days(date_from, date_until):
+    """
+    Frozen copy of ``zivinetz.utils.weeks.week_days`` at the time of this
+    migration: Yields ``(monday, days)`` for every calendar week overlapping
+    the interval ``[date_from, date_until]``
+    """
+    monday = date_from - timedelta(days=date_from.weekday())
+    while monday <= date_until:
+        sunday = monday + timedelta(days=6)
+        yield monday, (min(date_until, sunday) - max(date_from, monday)).days + 1
+        monday += timedelta(days=7)
+
+
+def forwards(apps, schema_editor):
+    Assignment = apps.get_model("zivinetz", "Assignment")
+    WeeklyOccupancy = apps.get_model("zivinetz", "WeeklyOccupancy")
+
+    WeeklyOccupancy.objects.bulk_create(
+        (
+            WeeklyOccupancy(
+                assignment_id=assignment.id,
+                drudge_id=assignment.drudge_id,
+                week=monday,
+                days=days,
+            )
+            for assignment in Assignment.objects.iterator(chunk_size=1000)
+            for monday, days in week_days(
+                assignment.date_from,
+                assignment.date_until_extension or assignment.date_until,
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("zivinetz", "0023_jobreferenceauthor_user"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WeeklyOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("week", models.DateField(verbose_name="week")),
+                ("days", models.PositiveSmallIntegerField(verbose_name="days")),
+                (
+                    "assignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="weekly_occupancy",
+                        to="zivinetz.assignment",
+                        verbose_name="assignment",
+                    ),
+                ),
+                (
+                    "drudge",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="zivinetz.drudge",
+                        verbose_name="drudge",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "weekly occupancy",
+                "verbose_name_plural": "weekly occupancies",
+                "indexes": [
+                    models.Index(
+                        fields=["week", "drudge"], name="zivinetz_we_week_d33507_idx"
+                    )
+                ],
+                "unique_together": {("assignment", "week")},
+            },
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
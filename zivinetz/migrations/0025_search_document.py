@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Func, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Lower
+
+
+# Frozen copies of zivinetz.utils.search.SEPARATOR and the managers'
+# search_fields at the time of this migration
+SEPARATOR = "\x1f"
+
+DRUDGE_FIELDS = [
+    "user__first_name",
+    "user__last_name",
+    "zdp_no",
+    "address",
+    "zip_code",
+    "city",
+    "place_of_citizenship_city",
+    "place_of_citizenship_state",
+    "phone_home",
+    "phone_office",
+    "mobile",
+    "bank_account",
+    "health_insurance_account",
+    "health_insurance_company",
+    "education_occupation",
+]
+ASSIGNMENT_FIELDS = [
+    "specification__scope_statement__name",
+    "specification__code",
+    *(f"drudge__{field}" for field in DRUDGE_FIELDS),
+]
+SEARCH_FIELDS = {
+    "drudge": DRUDGE_FIELDS,
+    "assignment": ASSIGNMENT_FIELDS,
+    "expensereport": [
+        "report_no",
+        "working_days_notes",
+        "free_days_notes",
+        "sick_days_notes",
+        "holi_days_notes",
+        "forced_leave_days_notes",
+        "clothing_expenses_notes",
+        "transport_expenses_notes",
+        "miscellaneous_notes",
+        *(f"assignment__{field}" for field in ASSIGNMENT_FIELDS),
+    ],
+    "jobreference": [
+        "text",
+        *(f"assignment__{field}" for field in ASSIGNMENT_FIELDS),
+    ],
+}
+
+
+def backfill_search_documents(apps, schema_editor):
+    # Documents are only maintained with the document backend; otherwise
+    # rebuild_search_documents has to be run when activating it
+    if getattr(settings, "ZIVINETZ_SEARCH_BACKEND", "fields") != "document":
+        return
+
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model("zivinetz", model_name)
+        model._base_manager.update(
+            search_document=Subquery(
+                model._base_manager
+                .filter(pk=OuterRef("pk"))
+                .order_by()
+                .annotate(
+                    document=Lower(
+                        Func(
+                            Value(SEPARATOR),
+                            *fields,
+                            function="CONCAT_WS",
+                            output_field=TextField(),
+                        )
+                    )
+                )
+                .values("document")[:1]
+            )
+        )
+
+
+INDEXES = [
+    ("zivinetz_drudge", "zivinetz_drudge_search_idx"),
+    ("zivinetz_assignment", "zivinetz_assign_search_idx"),
+    ("zivinetz_expensereport", "zivinetz_report_search_idx"),
+    ("zivinetz_jobreference", "zivinetz_jobref_search_idx"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            # Searching the documents works without index too, only slower
+            return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, name in INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table}"
+            " USING gin (search_document gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for _table, name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("zivinetz", "0024_weeklyoccupancy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assignment",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="drudge",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="expensereport",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="jobreference",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
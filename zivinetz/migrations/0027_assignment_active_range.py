@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("zivinetz", "0026_export_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assignment",
+            name="active_range",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(
+                        models.Q(
+                            ("date_until_extension__gte", models.F("date_from")),
+                            models.Q(
+                                ("date_until__gte", models.F("date_from")),
+                                ("date_until_extension__isnull", True),
+                            ),
+                            _connector="OR",
+                        ),
+                        then=models.Func(
+                            "date_from",
+                            django.db.models.functions.comparison.Coalesce(
+                                "date_until_extension", "date_until"
+                            ),
+                            models.Value("[]"),
+                            function="daterange",
+                            output_field=django.contrib.postgres.fields.ranges.DateRangeField(),
+                        ),
+                    ),
+                    default=None,
+                    output_field=django.contrib.postgres.fields.ranges.DateRangeField(),
+                ),
+                output_field=django.contrib.postgres.fields.ranges.DateRangeField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="assignment",
+            index=django.contrib.postgres.indexes.GistIndex(
+                fields=["active_range"], name="zivinetz_as_active__697722_gist"
+            ),
+        ),
+    ]
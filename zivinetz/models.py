@@ -1,20 +1,40 @@
-import inspect
+import sys
+import uuid
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date, timedelta
 from decimal import Decimal
+from functools import lru_cache
+from types import MappingProxyType
 
 from django.contrib.auth.models import User
-from django.contrib.postgres.fields import ArrayField
-from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q, signals
+from django.contrib.postgres.fields import ArrayField, DateRangeField
+from django.contrib.postgres.indexes import GistIndex
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections, models, transaction
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import F, Q, signals
+from django.db.models.functions import Cast, Coalesce
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext, gettext_lazy as _
 from towel.managers import SearchManager
+from towel.queryset_transform import TransformQuerySet
 from towel.resources.urls import model_resource_urls
 
+from zivinetz.middleware import current_request
+from zivinetz.utils.days import assignment_days
+from zivinetz.utils.search import (
+    SearchDocumentMixin,
+    document_backend_active,
+    update_search_documents,
+)
+from zivinetz.utils.storage import private_storage
+from zivinetz.utils.weeks import calendar_week, week_days, week_monday
+
 
 STATE_CHOICES = (
     ("AG", _("Aargau")),
@@ -108,8 +128,6 @@ class DrudgeQuota(models.Model):
         verbose_name_plural = _("drudge quotas")
 
     def __str__(self):
-        from zivinetz.views.scheduling import calendar_week
-
         year, week = calendar_week(self.week)
         return f"{self.scope_statement.name}: {self.quota} Zivis in KW{week} {year}"
 
@@ -202,53 +220,168 @@ class Specification(models.Model):
             ),
         )
 
-    def compensation(self, for_date=date.today):
-        cset = CompensationSet.objects.for_date(for_date)
+    def compensation_table(self, for_date=date.today, *, compensation_sets=None):
+        """
+        Returns the ``CompensationTable`` valid at ``for_date``
+        """
+        if compensation_sets is None:
+            compensation_sets = CompensationSet.objects
+        cset = compensation_sets.for_date(for_date)
+
+        return compensation_table(
+            tuple(getattr(self, field) for field in COMPENSATION_SPECIFICATION_FIELDS),
+            tuple(getattr(cset, field) for field in COMPENSATION_RATE_FIELDS),
+        )
+
+    def compensation(self, for_date=date.today, *, compensation_sets=None):
+        return dict(
+            self.compensation_table(for_date, compensation_sets=compensation_sets).rates
+        )
+
+
+COMPENSATION_DAY_TYPES = ("working", "sick", "free")
+COMPENSATION_MEALS = ("breakfast", "lunch", "supper")
+COMPENSATION_SPECIFICATION_FIELDS = (
+    *(
+        f"{kind}_{day_type}"
+        for day_type in COMPENSATION_DAY_TYPES
+        for kind in ("accomodation", *COMPENSATION_MEALS)
+    ),
+    "clothing",
+)
+COMPENSATION_RATE_FIELDS = (
+    "accomodation_home",
+    *(
+        f"{meal}_{where}"
+        for meal in COMPENSATION_MEALS
+        for where in ("at_accomodation", "external")
+    ),
+    "clothing",
+    "clothing_limit_per_assignment",
+)
+
 
-        # The spending_money default is only valid from 2023-01-01
-        compensation = {"spending_money": Decimal("7.50")}
+class CompensationTable:
+    """
+    Immutable daily compensation rates of a specification
 
-        for day_type in ("working", "sick", "free"):
-            key = "accomodation_%s" % day_type
-            value = getattr(self, key)
+    ``rates`` contains the same keys as ``Specification.compensation()``,
+    ``food`` the sum of all meals and ``daily`` the sum of accomodation and
+    meals (everything except the spending money) per day type.
+    """
 
-            if value == self.ACCOMODATION.provided:
+    __slots__ = ("daily", "food", "rates")
+
+    def __init__(self, rates):
+        food = {
+            day_type: sum(
+                (rates[f"{meal}_{day_type}"] for meal in COMPENSATION_MEALS),
+                Decimal("0.00"),
+            )
+            for day_type in COMPENSATION_DAY_TYPES
+        }
+        daily = {
+            day_type: rates["accomodation_%s" % day_type] + food[day_type]
+            for day_type in COMPENSATION_DAY_TYPES
+        }
+        self.rates = MappingProxyType(rates)
+        self.food = MappingProxyType(food)
+        self.daily = MappingProxyType(daily)
+
+
+@lru_cache(maxsize=256)
+def compensation_table(specification, rates):
+    """
+    Compiles a ``CompensationTable``
+
+    ``specification`` and ``rates`` are tuples of the values of
+    ``COMPENSATION_SPECIFICATION_FIELDS`` and ``COMPENSATION_RATE_FIELDS``.
+    Because the cache is keyed by values instead of primary keys, edited
+    specifications or compensation sets never see stale tables.
+    """
+    specification = dict(zip(COMPENSATION_SPECIFICATION_FIELDS, specification))
+    cset = dict(zip(COMPENSATION_RATE_FIELDS, rates))
+
+    # The spending_money default is only valid from 2023-01-01
+    compensation = {"spending_money": Decimal("7.50")}
+
+    for day_type in COMPENSATION_DAY_TYPES:
+        key = "accomodation_%s" % day_type
+
+        if specification[key] == Specification.ACCOMODATION.provided:
+            compensation[key] = Decimal("0.00")
+        else:
+            compensation[key] = cset["accomodation_home"]
+
+        for meal in COMPENSATION_MEALS:
+            key = f"{meal}_{day_type}"
+            value = specification[key]
+
+            if value == Specification.MEAL.no_compensation:
                 compensation[key] = Decimal("0.00")
             else:
-                compensation[key] = cset.accomodation_home
-
-            for meal in ("breakfast", "lunch", "supper"):
-                key = f"{meal}_{day_type}"
-                value = getattr(self, key)
-
-                if value == self.MEAL.no_compensation:
-                    compensation[key] = Decimal("0.00")
-                else:
-                    compensation[key] = getattr(cset, f"{meal}_{value}")
-
-        if self.clothing == self.CLOTHING.provided:
-            compensation.update({
-                "clothing": Decimal("0.00"),
-                "clothing_limit_per_assignment": Decimal("0.00"),
-            })
-        else:
-            compensation.update({
-                "clothing": cset.clothing,
-                "clothing_limit_per_assignment": cset.clothing_limit_per_assignment,
-            })
+                compensation[key] = cset[f"{meal}_{value}"]
+
+    if specification["clothing"] == Specification.CLOTHING.provided:
+        compensation.update({
+            "clothing": Decimal("0.00"),
+            "clothing_limit_per_assignment": Decimal("0.00"),
+        })
+    else:
+        compensation.update({
+            "clothing": cset["clothing"],
+            "clothing_limit_per_assignment": cset["clothing_limit_per_assignment"],
+        })
 
-        return compensation
+    return CompensationTable(compensation)
 
 
 class CompensationSetManager(models.Manager):
+    def index(self):
+        """
+        Returns a ``CompensationSetIndex`` of all compensation sets
+
+        The index is kept for the duration of the current request and dropped
+        when a compensation set is saved or deleted. Outside of requests a
+        fresh index is loaded on every call. The returned instances are shared
+        and must not be modified.
+        """
+        request = current_request()
+        if request is None:
+            return CompensationSetIndex(self.all())
+        if getattr(request, "_compensation_set_index", None) is None:
+            request._compensation_set_index = CompensationSetIndex(self.all())
+        return request._compensation_set_index
+
+    def clear_index(self):
+        request = current_request()
+        if request is not None:
+            request._compensation_set_index = None
+
+    def for_date(self, for_date=date.today):
+        return self.index().for_date(for_date)
+
+
+class CompensationSetIndex:
+    """
+    Sorted in-memory list of compensation sets offering the same
+    ``for_date`` lookup as ``CompensationSet.objects``
+    """
+
+    def __init__(self, compensation_sets):
+        self.compensation_sets = sorted(
+            compensation_sets, key=lambda cset: cset.valid_from
+        )
+        self.dates = [cset.valid_from for cset in self.compensation_sets]
+
     def for_date(self, for_date=date.today):
         if callable(for_date):
             for_date = for_date()
 
-        try:
-            return self.filter(valid_from__lte=for_date).order_by("-valid_from")[0]
-        except IndexError as exc:
-            raise self.model.DoesNotExist from exc
+        index = bisect_right(self.dates, for_date)
+        if not index:
+            raise CompensationSet.DoesNotExist
+        return self.compensation_sets[index - 1]
 
 
 @model_resource_urls()
@@ -315,6 +448,12 @@ class CompensationSet(models.Model):
         return gettext("compensation set, valid from %s") % self.valid_from
 
 
+@receiver(signals.post_save, sender=CompensationSet)
+@receiver(signals.post_delete, sender=CompensationSet)
+def compensation_set_changed(sender, instance, **kwargs):
+    CompensationSet.objects.clear_index()
+
+
 @model_resource_urls(default="edit")
 class RegionalOffice(models.Model):
     name = models.CharField(_("name"), max_length=100)
@@ -335,7 +474,7 @@ class RegionalOffice(models.Model):
         return self.name
 
 
-class DrudgeManager(SearchManager):
+class DrudgeManager(SearchDocumentMixin, SearchManager):
     search_fields = (
         "user__first_name",
         "user__last_name",
@@ -470,6 +609,9 @@ class Drudge(models.Model):
         _("profile image"), blank=True, null=True, upload_to="profile_images/"
     )
 
+    # See zivinetz.utils.search
+    search_document = models.TextField(editable=False, blank=True, default="")
+
     objects = DrudgeManager()
 
     class Meta:
@@ -486,22 +628,225 @@ class Drudge(models.Model):
         return msw.replace("-day", "T")
 
 
-class AssignmentManager(SearchManager):
-    search_fields = ["specification__scope_statement__name", "specification__code"] + [
-        "drudge__%s" % f for f in DrudgeManager.search_fields
-    ]
+#: Fields the weekly occupancy and the search documents depend on
+ASSIGNMENT_OCCUPANCY_FIELDS = {
+    "drudge",
+    "date_from",
+    "date_until",
+    "date_until_extension",
+}
+ASSIGNMENT_SEARCH_DOCUMENT_FIELDS = {"drudge", "specification"}
+
+
+class AssignmentQuerySet(TransformQuerySet):
+    """
+    Bulk operations which record ``AssignmentChange`` entries and update
+    the weekly occupancy and the search documents like saving every
+    assignment would
+
+    The previous values of all affected rows are fetched using one query
+    and the entries are written using one ``bulk_create``. Only entries
+    for assignments which actually changed are recorded. Rows updated by
+    ``bulk_create(update_conflicts=True)`` are recorded as changes, not as
+    created assignments.
+    """
+
+    def _field_names(self, names):
+        return {self.model._meta.get_field(name).name for name in names}
+
+    def update(self, **kwargs):
+        fields = self._field_names(kwargs)
+        if not fields & set(self.model.CHANGE_TRACKED_FIELDS):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            assignments = list(
+                self
+                .select_for_update(of=("self",))
+                .select_related("drudge__user", "specification")
+                .annotate(**{
+                    # e.g. date + interval is a timestamp in PostgreSQL
+                    "_updated_%s" % name: Cast(value, self.model._meta.get_field(name))
+                    for name, value in kwargs.items()
+                    if hasattr(value, "resolve_expression")
+                })
+            )
+            count = super().update(**kwargs)
+
+            changed_by = _changed_by()
+            entries = []
+            for assignment in assignments:
+                original = assignment.change_tracked_values()
+                for name, value in kwargs.items():
+                    if hasattr(value, "resolve_expression"):
+                        attname = self.model._meta.get_field(name).attname
+                        setattr(
+                            assignment,
+                            attname,
+                            getattr(assignment, "_updated_%s" % name),
+                        )
+                    else:
+                        setattr(assignment, name, value)
+                assignment._change_tracking_snapshot = (
+                    assignment.change_tracked_values()
+                )
+
+                if changes := assignment_changes(original, assignment):
+                    entries.append(
+                        AssignmentChange(
+                            assignment=assignment,
+                            assignment_description="%s" % assignment,
+                            changed_by=changed_by,
+                            changes="\n".join(changes),
+                        )
+                    )
+
+            AssignmentChange.objects.record_all(entries)
+            update_assignment_dependents(assignments, fields)
+        return count
+
+    update.alters_data = True
+
+    def bulk_create(
+        self,
+        objs,
+        batch_size=None,
+        *,
+        ignore_conflicts=False,
+        update_conflicts=False,
+        update_fields=None,
+        unique_fields=None,
+    ):
+        objs = list(objs)
+        opts = self.model._meta
+        with transaction.atomic(using=self.db):
+            previous = {}
+            if update_conflicts and unique_fields:
+                # PostgreSQL returns primary keys for updated rows too; fetch
+                # their previous values to record the actual changes
+                attnames = [
+                    opts.get_field(opts.pk.name if name == "pk" else name).attname
+                    for name in unique_fields
+                ]
+
+                def unique_key(obj):
+                    return tuple(getattr(obj, attname) for attname in attnames)
+
+                q = Q()
+                for obj in objs:
+                    q |= Q(**dict(zip(attnames, unique_key(obj), strict=True)))
+                previous = {
+                    unique_key(assignment): assignment
+                    for assignment in self
+                    .filter(q)
+                    .select_for_update(of=("self",))
+                    .select_related("drudge__user", "specification")
+                }
+
+            objs = super().bulk_create(
+                objs,
+                batch_size=batch_size,
+                ignore_conflicts=ignore_conflicts,
+                update_conflicts=update_conflicts,
+                update_fields=update_fields,
+                unique_fields=unique_fields,
+            )
+
+            changed_by = _changed_by()
+            entries = []
+            created = []
+            updated = []
+            for obj in objs:
+                if obj.pk is None:
+                    continue
+                assignment = previous.get(unique_key(obj)) if previous else None
+                if assignment is None:
+                    created.append(obj)
+                    entries.append(
+                        AssignmentChange(
+                            assignment=obj,
+                            assignment_description="%s" % obj,
+                            changed_by=changed_by,
+                            changes=gettext("Assignment has been created."),
+                        )
+                    )
+                    continue
+
+                # Only update_fields have been written, the other columns
+                # have kept their previous values
+                original = assignment.change_tracked_values()
+                for name in update_fields:
+                    attname = opts.get_field(name).attname
+                    setattr(assignment, attname, getattr(obj, attname))
+                updated.append((obj, assignment))
+                if changes := assignment_changes(original, assignment):
+                    entries.append(
+                        AssignmentChange(
+                            assignment=assignment,
+                            assignment_description="%s" % assignment,
+                            changed_by=changed_by,
+                            changes="\n".join(changes),
+                        )
+                    )
+
+            AssignmentChange.objects.record_all(entries)
+            if created:
+                update_assignment_dependents(created)
+            if updated:
+                update_assignment_dependents(
+                    [assignment for _obj, assignment in updated],
+                    self._field_names(update_fields),
+                )
+
+        for obj in created:
+            obj._change_tracking_snapshot = obj.change_tracked_values()
+        for obj, assignment in updated:
+            obj._change_tracking_snapshot = assignment.change_tracked_values()
+        return objs
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # Django's bulk_update() uses update(), which records the changes
+        objs = list(objs)
+        count = super().bulk_update(objs, fields, *args, **kwargs)
+
+        attnames = {self.model._meta.get_field(field).attname for field in fields}
+        for obj in objs:
+            obj._change_tracking_snapshot = {
+                **getattr(obj, "_change_tracking_snapshot", {}),
+                **{
+                    attname: value
+                    for attname, value in obj.change_tracked_values().items()
+                    if attname in attnames
+                },
+            }
+        return count
+
+    bulk_update.alters_data = True
 
     def for_date(self, day=None):
         day = day if day else date.today()
 
+        return self.filter(active_range__contains=day)
+
+    def overlapping(self, date_from, date_until=None):
+        """
+        Assignments active on at least one day between ``date_from`` and
+        ``date_until`` (inclusive, open-ended if either is ``None``)
+        """
         return self.filter(
-            Q(date_from__lte=day)
-            & (
-                Q(date_until__gte=day)
-                | Q(date_until_extension__isnull=False, date_until_extension__gte=day)
-            )
+            active_range__overlap=DateRange(date_from, date_until, bounds="[]")
         )
 
+
+class AssignmentManager(
+    SearchDocumentMixin, SearchManager.from_queryset(AssignmentQuerySet)
+):
+    search_fields = ["specification__scope_statement__name", "specification__code"] + [
+        "drudge__%s" % f for f in DrudgeManager.search_fields
+    ]
+
     def active_set(self, access, additional_ids=None):  # pragma: no cover
         q = Q(id__in=self.for_date())
         if additional_ids:
@@ -567,165 +912,153 @@ class Assignment(models.Model):
         _("motor saw course starting date"), blank=True, null=True
     )
 
+    # See zivinetz.utils.search
+    search_document = models.TextField(editable=False, blank=True, default="")
+
+    #: ``date_from`` until ``determine_date_until()``, inclusive. NULL for
+    #: inconsistent dates; ``daterange`` refuses an upper bound before the
+    #: lower bound.
+    active_range = models.GeneratedField(
+        expression=models.Case(
+            models.When(
+                Q(date_until_extension__gte=F("date_from"))
+                | Q(
+                    date_until_extension__isnull=True,
+                    date_until__gte=F("date_from"),
+                ),
+                then=models.Func(
+                    "date_from",
+                    Coalesce("date_until_extension", "date_until"),
+                    models.Value("[]"),
+                    function="daterange",
+                    output_field=DateRangeField(),
+                ),
+            ),
+            default=None,
+            output_field=DateRangeField(),
+        ),
+        output_field=DateRangeField(),
+        db_persist=True,
+    )
+
     objects = AssignmentManager()
 
+    #: Changes to these fields are recorded as ``AssignmentChange`` entries
+    CHANGE_TRACKED_FIELDS = [
+        "specification",
+        "drudge",
+        "date_from",
+        "date_until",
+        "date_until_extension",
+        "status",
+        "arranged_on",
+        "mobilized_on",
+        "environment_course_date",
+        "motor_saw_course_date",
+    ]
+
     class Meta:
         ordering = ["-date_from", "-date_until"]
+        indexes = [GistIndex(fields=["active_range"])]
         verbose_name = _("assignment")
         verbose_name_plural = _("assignments")
 
     def __str__(self):
         return f"{self.drudge} on {self.specification.code} ({self.date_from} - {self.determine_date_until()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._change_tracking_snapshot = instance.change_tracked_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        values = self.change_tracked_values()
+        if fields is None:
+            self._change_tracking_snapshot = values
+            return
+
+        # Only the reloaded fields are known to match the database, other
+        # fields may have been changed in memory since being loaded
+        reloaded = set()
+        for name in fields:
+            try:
+                reloaded.add(getattr(self._meta.get_field(name), "attname", None))
+            except FieldDoesNotExist:
+                pass
+        self._change_tracking_snapshot = {
+            **getattr(self, "_change_tracking_snapshot", {}),
+            **{
+                attname: value
+                for attname, value in values.items()
+                if attname in reloaded
+            },
+        }
+
+    def change_tracked_values(self):
+        """
+        Returns the loaded values of all change tracked fields, keyed by
+        their attribute name (``drudge_id`` instead of ``drudge``)
+        """
+        values = {}
+        for field in self.CHANGE_TRACKED_FIELDS:
+            attname = self._meta.get_field(field).attname
+            if attname in self.__dict__:
+                values[attname] = self.__dict__[attname]
+        return values
+
     def determine_date_until(self):
         return self.date_until_extension or self.date_until
 
     determine_date_until.short_description = _("eff. until date")
 
-    def assignment_days(self):
-        day = self.date_from
+    def assignment_days(self, *, public_holidays=None, company_holidays=None):
         until = self.determine_date_until()
-        one_day = timedelta(days=1)
-
-        public_holidays = PublicHoliday.objects.filter(
-            date__range=(day, until)
-        ).values_list("date", flat=True)
-        company_holidays = self.specification.scope_statement.company_holidays
-        company_holidays = list(
-            company_holidays.filter(date_from__lte=until, date_until__gte=day)
-        )
-
-        vacation_days = 0
-        # +1 because the range is inclusive
-        assignment_days = (self.date_until - self.date_from).days + 1
-
-        if assignment_days >= 180:
-            # 30 days isn't exactly one month. But that's good enough for us.
-            # We grant 2 additional vacation days per 30 full days only
-            # (see ZDV Art. 72)
-            vacation_days = 8 + int((assignment_days - 180) / 30) * 2
-
-        days = {
-            "assignment_days": assignment_days,
-            "vacation_days": vacation_days,
-            "company_holidays": 0,
-            "public_holidays_during_company_holidays": 0,
-            "public_holidays_outside_company_holidays": 0,
-            "vacation_days_during_company_holidays": 0,
-            "freely_definable_vacation_days": vacation_days,
-            "working_days": 0,
-            "countable_days": 0,
-            # days which aren't countable and are forced upon the drudge:
-            "forced_leave_days": 0,
-        }
-
-        monthly_expense_days = {}
-
-        def pop_company_holiday():
-            try:
-                return company_holidays.pop(0)
-            except IndexError:
-                return None
-
-        company_holiday = pop_company_holiday()
-
-        while day <= until:
-            is_weekend = day.weekday() in (5, 6)
-            is_public_holiday = day in public_holidays
-            is_company_holiday = company_holiday and company_holiday.is_contained(day)
-            slot = "free"
-
-            if is_company_holiday:
-                days["company_holidays"] += 1
-
-                if is_public_holiday:
-                    # At least we have public holidays too.
-                    days["public_holidays_during_company_holidays"] += 1
-                    days["countable_days"] += 1
-                else:
-                    if is_weekend:
-                        # We were lucky once again.
-                        days["countable_days"] += 1
-                    else:
-                        # Oh no, company holiday and neither public holiday nor
-                        # weekend. Now the draconian regime of the swiss
-                        # administration comes to full power.
-
-                        if days["freely_definable_vacation_days"]:
-                            # Vacations need to be taken during public holidays
-                            # if possible at all. Unfortunately for drudges.
-                            days["freely_definable_vacation_days"] -= 1
-                            days["vacation_days_during_company_holidays"] += 1
-                            slot = "holi"
-
-                            # At least they are countable towards assignment
-                            # total.
-                            days["countable_days"] += 1
-                        else:
-                            # Damn. No vacation days left (if there were any in
-                            # the beginning. The drudge has to pause his
-                            # assignment for this time.
-                            days["forced_leave_days"] += 1
-                            slot = "forced"
 
-            else:
-                # No company holiday... business as usual, maybe.
-                days["countable_days"] += 1  # Nice!
-
-                if not (is_public_holiday or is_weekend):
-                    # Hard beer-drinking and pickaxing action.
-                    days["working_days"] += 1
-                    slot = "working"
-
-            key = (day.year, day.month, 1)
-            if day.month == self.date_from.month and day.year == self.date_from.year:
-                key = (self.date_from.year, self.date_from.month, self.date_from.day)
-
-            if day > self.date_until:
-                # Only the case when assignment has been extended
-                # If we are in the same month as the original end of the
-                # assignment, create a new key for the extension part of
-                # the given month only
-                if (
-                    day.month == self.date_until.month
-                    and day.year == self.date_until.year
-                ):
-                    extended_start = self.date_until + one_day
-                    key = (
-                        extended_start.year,
-                        extended_start.month,
-                        extended_start.day,
-                    )
-
-            monthly_expense_days.setdefault(
-                key, {"free": 0, "working": 0, "holi": 0, "forced": 0, "start": day}
+        if public_holidays is None:
+            public_holidays = list(
+                PublicHoliday.objects
+                .filter(date__range=(self.date_from, until))
+                .order_by("date")
+                .values_list("date", flat=True)
+            )
+        if company_holidays is None:
+            scope_statement = self.specification.scope_statement
+            company_holidays = scope_statement.company_holidays.filter(
+                date_from__lte=until, date_until__gte=self.date_from
             )
-            monthly_expense_days[key][slot] += 1
-            monthly_expense_days[key]["end"] = day
-
-            day += one_day
-
-            # Fetch new company holiday once the old one starts smelling funny.
-            if company_holiday and company_holiday.date_until < day:
-                company_holiday = pop_company_holiday()
 
-        return days, sorted(monthly_expense_days.items(), key=lambda item: item[0])
+        return assignment_days(
+            self.date_from,
+            self.date_until,
+            self.date_until_extension,
+            public_holidays,
+            company_holidays,
+        )
 
-    def expenses(self):
+    def expenses(self, assignment_days=None, *, compensation_sets=None):
         """
         This calculates an estimate
+
+        Pass the result of ``assignment_days()`` and preloaded compensation
+        sets when calculating expenses for many assignments at once.
         """
 
-        assignment_days, monthly_expense_days = self.assignment_days()
+        if assignment_days is None:
+            assignment_days = self.assignment_days()
+        assignment_days, monthly_expense_days = assignment_days
         specification = self.specification
 
         clothing_total = None
         expenses = {}
 
         for month, days in monthly_expense_days:
-            compensation = specification.compensation(
-                date(month[0], month[1], month[2])
+            table = specification.compensation_table(
+                date(month[0], month[1], month[2]),
+                compensation_sets=compensation_sets,
             )
+            compensation = table.rates
 
             free = days["free"]
             working = days["working"]
@@ -739,18 +1072,7 @@ class Assignment(models.Model):
                     free * compensation["accomodation_free"]
                     + working * compensation["accomodation_working"]
                 ),
-                "food": free
-                * (
-                    compensation["breakfast_free"]
-                    + compensation["lunch_free"]
-                    + compensation["supper_free"]
-                )
-                + working
-                * (
-                    compensation["breakfast_working"]
-                    + compensation["lunch_working"]
-                    + compensation["supper_working"]
-                ),
+                "food": free * table.food["free"] + working * table.food["working"],
             }
 
             if clothing_total is None:
@@ -774,43 +1096,67 @@ class Assignment(models.Model):
     admin_pdf_url.short_description = "PDF"
 
     def generate_expensereports(self):
-        occupied_months = [
-            (d.year, d.month, d.day)
-            for d in self.reports.values_list("date_from", flat=True)
-        ]
+        return ExpenseReport.objects.generate_for_assignments([self])
 
-        _days, monthly_expense_days, expenses = self.expenses()
 
-        created = 0
-        for month, data in monthly_expense_days:
-            if month in occupied_months:
-                continue
+_collected_assignment_changes = ContextVar(
+    "zivinetz_collected_assignment_changes", default=None
+)
+
+
+class AssignmentChangeManager(models.Manager):
+    @contextmanager
+    def collect(self):
+        """
+        Collects the entries of all assignments saved or deleted inside the
+        block and writes them using a single ``bulk_create`` in the same
+        transaction
+        """
+        if _collected_assignment_changes.get() is not None:
+            yield
+            return
 
+        changes = []
+        with transaction.atomic(using=self.db):
+            token = _collected_assignment_changes.set(changes)
             try:
-                clothing_expenses = expenses[month]["clothing"]
-            except KeyError:
-                clothing_expenses = 0
-
-            report = self.reports.create(
-                date_from=data["start"],
-                date_until=data["end"],
-                working_days=data["working"],
-                free_days=data["free"],
-                sick_days=0,
-                holi_days=data["holi"],
-                forced_leave_days=data["forced"],
-                calculated_total_days=sum(
-                    (data["working"], data["free"], data["holi"], data["forced"]), 0
-                ),
-                clothing_expenses=clothing_expenses,
-                specification=self.specification,
-            )
+                yield
+            finally:
+                _collected_assignment_changes.reset(token)
+            self.bulk_create(changes)
 
-            report.recalculate_total()
+    def record(self, **kwargs):
+        """
+        Creates an entry, or adds it to the entries collected by
+        ``collect``
+        """
+        change = self.model(**kwargs)
+        changes = _collected_assignment_changes.get()
+        if changes is None:
+            change.save()
+        else:
+            changes.append(change)
+        return change
 
-            created += 1
+    def record_all(self, entries):
+        """
+        Creates all entries using a single ``bulk_create``, or adds them to
+        the entries collected by ``collect``
+        """
+        changes = _collected_assignment_changes.get()
+        if changes is None:
+            self.bulk_create(entries)
+        else:
+            changes.extend(entries)
 
-        return created
+    def forget_assignment(self, assignment):
+        """
+        Does for collected entries what ``on_delete=SET_NULL`` does for
+        saved ones
+        """
+        for change in _collected_assignment_changes.get() or ():
+            if change.assignment_id == assignment.pk:
+                change.assignment = None
 
 
 @model_resource_urls()
@@ -829,6 +1175,8 @@ class AssignmentChange(models.Model):
     changed_by = models.CharField(_("changed by"), max_length=100, default="nobody")
     changes = models.TextField(_("changes"), blank=True)
 
+    objects = AssignmentChangeManager()
+
     class Meta:
         ordering = ["created"]
         verbose_name = _("assignment change")
@@ -838,95 +1186,241 @@ class AssignmentChange(models.Model):
         return self.assignment_description
 
 
+class WeeklyOccupancyManager(models.Manager):
+    def rebuild(self, assignments):
+        """
+        Replaces the rows of the given assignments, returns the count of
+        created rows
+        """
+        assignments = list(assignments)
+        self.filter(assignment__in=assignments).delete()
+        return len(
+            self.bulk_create([
+                self.model(
+                    assignment=assignment,
+                    drudge_id=assignment.drudge_id,
+                    week=monday,
+                    days=days,
+                )
+                for assignment in assignments
+                for monday, days in week_days(
+                    assignment.date_from, assignment.determine_date_until()
+                )
+            ])
+        )
+
+
+class WeeklyOccupancy(models.Model):
+    """
+    Days of an assignment falling into a calendar week
+
+    Maintained by the assignment signal handlers below; use the
+    ``rebuild_weekly_occupancy`` management command after changing
+    assignments without sending signals.
+    """
+
+    assignment = models.ForeignKey(
+        Assignment,
+        on_delete=models.CASCADE,
+        related_name="weekly_occupancy",
+        verbose_name=_("assignment"),
+    )
+    drudge = models.ForeignKey(
+        Drudge,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("drudge"),
+    )
+    week = models.DateField(_("week"))
+    days = models.PositiveSmallIntegerField(_("days"))
+
+    objects = WeeklyOccupancyManager()
+
+    class Meta:
+        unique_together = [("assignment", "week")]
+        indexes = [models.Index(fields=["week", "drudge"])]
+        verbose_name = _("weekly occupancy")
+        verbose_name_plural = _("weekly occupancies")
+
+    def __str__(self):
+        return f"{self.assignment}: {self.days} days in week of {self.week}"
+
+
 def get_request():
-    """Walk up the stack, return the nearest first argument named "request"."""
-    frame = None
+    """
+    Returns the request set by ``CurrentRequestMiddleware``, otherwise
+    walks up the stack and returns the nearest first argument named
+    "request"
+    """
+    request = current_request()
+    if request is not None:
+        return request
+
+    frame = sys._getframe(1)
     try:
-        for f in inspect.stack()[1:]:
-            frame = f[0]
+        while frame is not None:
             code = frame.f_code
             if code.co_varnames[:1] == ("request",):
                 return frame.f_locals["request"]
             if code.co_varnames[:2] == ("self", "request"):
                 return frame.f_locals["request"]
+            frame = frame.f_back
     finally:
         del frame
 
 
-@receiver(signals.pre_save, sender=Assignment)
-def assignment_pre_save(sender, instance, **kwargs):
-    try:
-        original = Assignment.objects.get(pk=instance.pk)
-    except (AttributeError, Assignment.DoesNotExist):
-        original = None
+def _changed_by():
+    # Do not name the local variable "request", get_request() would find it
+    current = get_request()
+    return current.user.get_full_name() if current else "unknown"
 
-    changes = []
-    if not original:
-        changes.append(gettext("Assignment has been created."))
-    else:
-        change_tracked_fields = [
-            "specification",
-            "drudge",
-            "date_from",
-            "date_until",
-            "date_until_extension",
-            "status",
-            "arranged_on",
-            "mobilized_on",
-            "environment_course_date",
-            "motor_saw_course_date",
-        ]
 
-        def nicify(instance, field):
-            if hasattr(instance, "get_%s_display" % field):
-                return getattr(instance, "get_%s_display" % field)()
-            return getattr(instance, field) or "-"
+def _nicify_value(field, value):
+    if value is None:
+        return "-"
+    if field.choices:
+        return dict(field.flatchoices).get(value, value)
+    if field.is_relation:
+        return field.related_model._base_manager.filter(pk=value).first() or "-"
+    return value or "-"
 
-        for field in change_tracked_fields:
-            if getattr(original, field) == getattr(instance, field):
-                continue
 
-            field_instance = Assignment._meta.get_field(field)
-            changes.append(
-                gettext(
-                    "The value of `%(field)s` has been changed from %(from)s to %(to)s."
-                )
-                % {
-                    "field": field_instance.verbose_name,
-                    "from": nicify(original, field),
-                    "to": nicify(instance, field),
-                }
+def _nicify(instance, field):
+    if hasattr(instance, "get_%s_display" % field):
+        return getattr(instance, "get_%s_display" % field)()
+    return getattr(instance, field) or "-"
+
+
+def assignment_changes(original, instance):
+    """
+    Describes the differences between the change tracked values in
+    ``original`` (keyed by attribute name) and those of ``instance``
+
+    Fields missing from ``original`` are skipped; ``assignment_pre_save``
+    only omits fields which are deferred on ``instance`` and therefore not
+    saved.
+    """
+    changes = []
+    for field in Assignment.CHANGE_TRACKED_FIELDS:
+        field_instance = Assignment._meta.get_field(field)
+        attname = field_instance.attname
+        if attname not in original or original[attname] == getattr(instance, attname):
+            continue
+
+        changes.append(
+            gettext(
+                "The value of `%(field)s` has been changed from %(from)s to %(to)s."
             )
+            % {
+                "field": field_instance.verbose_name,
+                "from": _nicify_value(field_instance, original[attname]),
+                "to": _nicify(instance, field),
+            }
+        )
+    return changes
+
+
+def update_assignment_dependents(assignments, fields=None):
+    """
+    Updates the weekly occupancy and the search documents of
+    ``assignments`` after changing ``fields`` (all if ``None``) without
+    sending signals
+    """
+    if fields is None or fields & ASSIGNMENT_OCCUPANCY_FIELDS:
+        WeeklyOccupancy.objects.rebuild(assignments)
+    if fields is None or fields & ASSIGNMENT_SEARCH_DOCUMENT_FIELDS:
+        pks = [assignment.pk for assignment in assignments]
+        for model, path in SEARCH_DOCUMENT_DEPENDENCIES[Assignment][1]:
+            update_search_documents(
+                model._base_manager.filter(**{"%s__in" % path: pks})
+            )
+
+
+ASSIGNMENT_OCCUPANCY_ATTNAMES = {
+    Assignment._meta.get_field(name).attname for name in ASSIGNMENT_OCCUPANCY_FIELDS
+}
+
 
-    request = get_request()
+@receiver(signals.pre_save, sender=Assignment)
+def assignment_pre_save(sender, instance, update_fields=None, **kwargs):
+    original = getattr(instance, "_change_tracking_snapshot", None)
+    if instance.pk is not None:
+        # Fields without a snapshot: The instance has not been loaded from
+        # the database (Assignment(pk=...).save()) or the fields have been
+        # deferred when loading and assigned afterwards. Fields which are
+        # still deferred are not saved and cannot have changed.
+        missing = [
+            attname
+            for attname in instance.change_tracked_values()
+            if original is None or attname not in original
+        ]
+        if missing:
+            values = (
+                Assignment._base_manager.filter(pk=instance.pk).values(*missing).first()
+            )
+            if values is not None:
+                original = {**(original or {}), **values}
+
+    if original:
+        if update_fields is not None:
+            # Only the saved fields can have changed
+            saved = {Assignment._meta.get_field(name).attname for name in update_fields}
+            original = {
+                attname: value
+                for attname, value in original.items()
+                if attname in saved
+            }
+        changes = assignment_changes(original, instance)
+        # The weekly occupancy only has to be rebuilt if the fields it
+        # depends on have been changed and are actually saved
+        instance._occupancy_changed = any(
+            attname in original and original[attname] != getattr(instance, attname)
+            for attname in ASSIGNMENT_OCCUPANCY_ATTNAMES
+        )
+    else:
+        changes = [gettext("Assignment has been created.")]
+        instance._occupancy_changed = True
 
     instance._assignment_change = {
         "assignment": instance,
         "assignment_description": "%s" % instance,
-        "changed_by": request.user.get_full_name() if request else "unknown",
+        "changed_by": _changed_by(),
         "changes": "\n".join(changes),
     }
 
 
 @receiver(signals.post_save, sender=Assignment)
-def assignment_post_save(sender, instance, **kwargs):
+def assignment_post_save(sender, instance, update_fields=None, **kwargs):
     if getattr(instance, "_assignment_change", None):
-        AssignmentChange.objects.create(**instance._assignment_change)
+        AssignmentChange.objects.record(**instance._assignment_change)
+        instance._assignment_change = None
+    values = instance.change_tracked_values()
+    if update_fields is not None:
+        # Fields which have not been saved still differ from the database
+        saved = {Assignment._meta.get_field(name).attname for name in update_fields}
+        values = {
+            **getattr(instance, "_change_tracking_snapshot", {}),
+            **{attname: value for attname, value in values.items() if attname in saved},
+        }
+    instance._change_tracking_snapshot = values
+
+    if getattr(instance, "_occupancy_changed", True):
+        WeeklyOccupancy.objects.rebuild([instance])
+        instance._occupancy_changed = False
 
 
 @receiver(signals.post_delete, sender=Assignment)
 def assignment_post_delete(sender, instance, **kwargs):
-    request = get_request()
-
-    AssignmentChange.objects.create(
+    AssignmentChange.objects.forget_assignment(instance)
+    AssignmentChange.objects.record(
         assignment=None,
         assignment_description="%s" % instance,
-        changed_by=request.user.get_full_name() if request else "unknown",
+        changed_by=_changed_by(),
         changes=gettext("Assignment has been deleted."),
     )
 
 
-class ExpenseReportManager(SearchManager):
+class ExpenseReportManager(SearchDocumentMixin, SearchManager):
     search_fields = [
         "report_no",
         "working_days_notes",
@@ -939,6 +1433,124 @@ class ExpenseReportManager(SearchManager):
         "miscellaneous_notes",
     ] + ["assignment__%s" % f for f in AssignmentManager.search_fields]
 
+    def generate_for_assignments(self, assignments):
+        """
+        Generates the missing expense reports of all passed assignments
+
+        Public holidays, company holidays and compensation sets are loaded
+        once for the whole date span, all reports are calculated in memory
+        and inserted using a single ``bulk_create``. Returns the count of
+        created expense reports.
+        """
+        assignments = list(assignments)
+        if not assignments:
+            return 0
+
+        date_from = min(assignment.date_from for assignment in assignments)
+        date_until = max(
+            assignment.determine_date_until() for assignment in assignments
+        )
+
+        public_holidays = list(
+            PublicHoliday.objects
+            .filter(date__range=(date_from, date_until))
+            .order_by("date")
+            .values_list("date", flat=True)
+        )
+
+        company_holidays = defaultdict(list)
+        for relation in CompanyHoliday.applies_to.through.objects.filter(
+            scopestatement__in={
+                assignment.specification.scope_statement_id
+                for assignment in assignments
+            },
+            companyholiday__date_from__lte=date_until,
+            companyholiday__date_until__gte=date_from,
+        ).select_related("companyholiday"):
+            company_holidays[relation.scopestatement_id].append(relation.companyholiday)
+
+        compensation_sets = CompensationSet.objects.index()
+
+        occupied = set(
+            self.filter(assignment__in=assignments).values_list(
+                "assignment", "date_from"
+            )
+        )
+
+        reports = []
+        for assignment in assignments:
+            _days, monthly_expense_days, expenses = assignment.expenses(
+                assignment.assignment_days(
+                    public_holidays=public_holidays,
+                    company_holidays=company_holidays[
+                        assignment.specification.scope_statement_id
+                    ],
+                ),
+                compensation_sets=compensation_sets,
+            )
+
+            for month, data in monthly_expense_days:
+                if (assignment.id, data["start"]) in occupied:
+                    continue
+
+                try:
+                    clothing_expenses = expenses[month]["clothing"]
+                except KeyError:
+                    clothing_expenses = 0
+
+                report = self.model(
+                    assignment=assignment,
+                    date_from=data["start"],
+                    date_until=data["end"],
+                    working_days=data["working"],
+                    free_days=data["free"],
+                    sick_days=0,
+                    holi_days=data["holi"],
+                    forced_leave_days=data["forced"],
+                    calculated_total_days=sum(
+                        (data["working"], data["free"], data["holi"], data["forced"]),
+                        0,
+                    ),
+                    clothing_expenses=clothing_expenses,
+                    specification=assignment.specification,
+                )
+                report.recalculate_total(
+                    save=False, compensation_sets=compensation_sets
+                )
+                reports.append(report)
+
+        if reports:
+            self.bulk_create(reports)
+            # bulk_create does not send post_save signals
+            update_search_documents(
+                self.filter(pk__in=[report.pk for report in reports])
+            )
+        return len(reports)
+
+    def recalculate_totals(self, reports, fields=()):
+        """
+        Recalculates the totals of ``reports`` and saves them together with
+        the additional ``fields`` using a single ``bulk_update``
+
+        The reports should be fetched using
+        ``select_related("assignment", "specification")``.
+        """
+        reports = list(reports)
+        if not reports:
+            return 0
+
+        compensation_sets = CompensationSet.objects.index()
+        for report in reports:
+            report.recalculate_total(save=False, compensation_sets=compensation_sets)
+
+        count = self.bulk_update(reports, ["total", *fields])
+        if set(fields) & set(self.search_fields):
+            # bulk_update does not send post_save signals
+            update_search_documents(
+                self.filter(pk__in=[report.pk for report in reports])
+            )
+        return count
+
 
 @model_resource_urls()
 class ExpenseReport(models.Model):
@@ -1008,6 +1620,9 @@ class ExpenseReport(models.Model):
         Specification, verbose_name=_("specification"), on_delete=models.CASCADE
     )
 
+    # See zivinetz.utils.search
+    search_document = models.TextField(editable=False, blank=True, default="")
+
     objects = ExpenseReportManager()
 
     class Meta:
@@ -1031,42 +1646,54 @@ class ExpenseReport(models.Model):
     def pdf_url(self):
         return reverse("zivinetz_expensereport_pdf", args=(self.pk,))
 
-    def recalculate_total(self, *, save=True):
-        _n1, _n2, self.total = self.compensations()
+    def recalculate_total(self, *, save=True, compensation_sets=None):
+        _n1, _n2, self.total = self.compensations(compensation_sets=compensation_sets)
         if save:
             self.save()
 
-    def compensation_data(self, arranged_on=None):
+    @property
+    def spending_money(self):
+        return Decimal("5.00") if self.date_from < date(2023, 1, 1) else Decimal("7.50")
+
+    def compensation_table(self, arranged_on=None, *, compensation_sets=None):
         arranged_on = arranged_on or self.assignment.arranged_on
         if not arranged_on:
             return None
 
-        return self.specification.compensation(arranged_on) | {
-            "spending_money": Decimal("5.00")
-            if self.date_from < date(2023, 1, 1)
-            else Decimal("7.50")
-        }
+        return self.specification.compensation_table(
+            arranged_on, compensation_sets=compensation_sets
+        )
 
-    def compensations(self):
+    def compensation_data(self, arranged_on=None, *, compensation_sets=None):
+        table = self.compensation_table(
+            arranged_on, compensation_sets=compensation_sets
+        )
+        if table is None:
+            return None
+        return dict(table.rates) | {"spending_money": self.spending_money}
+
+    def compensations(self, *, compensation_sets=None):
         if not self.assignment.arranged_on:
             # Make recalculate_total not fall flat on its face
             return None, None, 0
 
-        compensation = self.compensation_data()
+        table = self.compensation_table(compensation_sets=compensation_sets)
+        compensation = table.rates
+        spending_money = self.spending_money
 
         # spending_money, accomodation, breakfast, lunch, supper, total
 
         def line(title, day_type, days):
-            line = [
-                compensation["spending_money"],
+            return [
+                f"{days} {title}",
+                spending_money,
                 compensation["accomodation_%s" % day_type],
                 compensation["breakfast_%s" % day_type],
                 compensation["lunch_%s" % day_type],
                 compensation["supper_%s" % day_type],
+                (spending_money + table.daily[day_type]) * days,
             ]
 
-            return [f"{days} {title}", *line, sum(line) * days]
-
         ret = [
             [
                 "",
@@ -1230,7 +1857,7 @@ class JobReferenceTemplate(models.Model):
         return self.title
 
 
-class JobReferenceManager(SearchManager):
+class JobReferenceManager(SearchDocumentMixin, SearchManager):
     search_fields = ["text"] + [
         "assignment__%s" % f for f in AssignmentManager.search_fields
     ]
@@ -1272,6 +1899,9 @@ class JobReference(models.Model):
     author_full_name = models.CharField(_("full name"), max_length=100)
     author_function = models.CharField(_("function"), max_length=100)
 
+    # See zivinetz.utils.search
+    search_document = models.TextField(editable=False, blank=True, default="")
+
     objects = JobReferenceManager()
 
     class Meta:
@@ -1286,6 +1916,80 @@ class JobReference(models.Model):
         return reverse("zivinetz_reference_pdf", args=(self.pk,))
 
 
+# Models whose search documents contain fields of the sender, with the path
+# from the model to the sender and the sender's fields they contain (None
+# standing for any field)
+SEARCH_DOCUMENT_DEPENDENCIES = {
+    User: (
+        {"first_name", "last_name"},
+        [
+            (Drudge, "user"),
+            (Assignment, "drudge__user"),
+            (ExpenseReport, "assignment__drudge__user"),
+            (JobReference, "assignment__drudge__user"),
+        ],
+    ),
+    ScopeStatement: (
+        {"name"},
+        [
+            (Assignment, "specification__scope_statement"),
+            (ExpenseReport, "assignment__specification__scope_statement"),
+            (JobReference, "assignment__specification__scope_statement"),
+        ],
+    ),
+    Specification: (
+        {"code"},
+        [
+            (Assignment, "specification"),
+            (ExpenseReport, "assignment__specification"),
+            (JobReference, "assignment__specification"),
+        ],
+    ),
+    Drudge: (
+        None,
+        [
+            (Drudge, "pk"),
+            (Assignment, "drudge"),
+            (ExpenseReport, "assignment__drudge"),
+            (JobReference, "assignment__drudge"),
+        ],
+    ),
+    Assignment: (
+        None,
+        [
+            (Assignment, "pk"),
+            (ExpenseReport, "assignment"),
+            (JobReference, "assignment"),
+        ],
+    ),
+    ExpenseReport: (None, [(ExpenseReport, "pk")]),
+    JobReference: (None, [(JobReference, "pk")]),
+}
+
+
+@receiver(signals.post_save, sender=User)
+@receiver(signals.post_save, sender=ScopeStatement)
+@receiver(signals.post_save, sender=Specification)
+@receiver(signals.post_save, sender=Drudge)
+@receiver(signals.post_save, sender=Assignment)
+@receiver(signals.post_save, sender=ExpenseReport)
+@receiver(signals.post_save, sender=JobReference)
+def search_document_post_save(sender, instance, update_fields=None, **kwargs):
+    fields, dependents = SEARCH_DOCUMENT_DEPENDENCIES[sender]
+    if (
+        kwargs.get("raw")
+        or not document_backend_active()
+        or (update_fields and fields and not fields & set(update_fields))
+    ):
+        return
+
+    for model, path in dependents:
+        if kwargs.get("created") and path != "pk":
+            # New rows cannot be referenced yet
+            continue
+        update_search_documents(model._base_manager.filter(**{path: instance.pk}))
+
+
 class GroupQuerySet(models.QuerySet):
     def active(self):
         return self.filter(is_active=True)
@@ -1310,11 +2014,46 @@ class Group(models.Model):
 
 class GroupAssignmentQuerySet(models.QuerySet):
     def monday(self, day):
-        return day - timedelta(days=day.weekday())
+        return week_monday(day)
 
     def for_date(self, day):
         return self.filter(week=self.monday(day))
 
+    def copy_forward(self, day, weeks, scope_statement=None):
+        """
+        Copies the group assignments of the week containing ``day`` into the
+        following ``weeks`` weeks using a single ``INSERT ... SELECT``
+
+        Only group assignments matched by this queryset are copied, optionally
+        limited to assignments belonging to ``scope_statement``. Assignments
+        ending before a target week are skipped and existing group assignments
+        of the target weeks are kept. Returns the number of created group
+        assignments.
+        """
+        source = self.filter(week=self.monday(day))
+        if scope_statement is not None:
+            source = source.filter(
+                assignment__specification__scope_statement=scope_statement
+            )
+        source_sql, source_params = source.values("pk").query.sql_with_params()
+
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {GroupAssignment._meta.db_table}
+                    (group_id, assignment_id, week)
+                SELECT ga.group_id, ga.assignment_id, ga.week + 7 * n
+                FROM {GroupAssignment._meta.db_table} ga
+                INNER JOIN {Assignment._meta.db_table} a ON a.id = ga.assignment_id
+                CROSS JOIN generate_series(1, %s::integer) n
+                WHERE ga.id IN ({source_sql})
+                AND COALESCE(a.date_until_extension, a.date_until) >= ga.week + 7 * n
+                ON CONFLICT (assignment_id, week) DO NOTHING
+                """,
+                [weeks, *source_params],
+            )
+            return cursor.rowcount
+
 
 class GroupAssignment(models.Model):
     group = models.ForeignKey(
@@ -1346,7 +2085,7 @@ class GroupAssignment(models.Model):
         )
 
     def save(self, *args, **kwargs):
-        self.week = self.week - timedelta(days=self.week.weekday())
+        self.week = week_monday(self.week)
         super().save(*args, **kwargs)
 
     save.alters_data = True
@@ -1364,31 +2103,64 @@ class AbsenceManager(SearchManager):
     )
 
     def for_expense_report(self, report):
-        candidate_days = [
-            report.date_from + timedelta(days=i)
-            for i in range((report.date_until - report.date_from).days)
-        ]
+        return self.for_expense_reports([report])[report.pk]
 
-        days = defaultdict(int)
-        reasons = defaultdict(list)
+    def for_expense_reports(self, reports):
+        """
+        Returns a dictionary mapping the primary keys of ``reports`` to the
+        number of absence days and the notes per expense report field
+
+        All absences are fetched using a single query. The last day of the
+        expense reports is not taken into account.
+        """
+        reports = list(reports)
+        result = {report.pk: {} for report in reports}
+
+        reports_by_assignment = defaultdict(list)
+        candidate_days = set()
+        for report in reports:
+            reports_by_assignment[report.assignment_id].append(report)
+            candidate_days.update(
+                report.date_from + timedelta(days=i)
+                for i in range((report.date_until - report.date_from).days)
+            )
+
+        if not candidate_days:
+            return result
+
+        days = defaultdict(lambda: defaultdict(int))
+        reasons = defaultdict(lambda: defaultdict(list))
 
         for absence in self.filter(
-            assignment_id=report.assignment_id, days__overlap=candidate_days
+            assignment_id__in=reports_by_assignment.keys(),
+            days__overlap=sorted(candidate_days),
         ):
-            in_range = [day for day in sorted(absence.days) if day in candidate_days]
+            absence_days = sorted(absence.days)
             field = absence.REASON_TO_EXPENSE_REPORT[absence.reason]
-            days[field] += len(in_range)
-            parts = [absence.get_reason_display()]
-            if absence.internal_notes:
-                parts.append(" (%s)" % absence.internal_notes)
-            parts.append(": ")
-            parts.append(", ".join(day.strftime("%a %d.%m.%y") for day in in_range))
-            reasons["%s_notes" % field].append("".join(parts))
-
-        return {
-            **days,
-            **{field: "\n".join(reason) for field, reason in reasons.items()},
-        }
+
+            for report in reports_by_assignment[absence.assignment_id]:
+                in_range = absence_days[
+                    bisect_left(absence_days, report.date_from) : bisect_left(
+                        absence_days, report.date_until
+                    )
+                ]
+                if not in_range:
+                    continue
+
+                days[report.pk][field] += len(in_range)
+                parts = [absence.get_reason_display()]
+                if absence.internal_notes:
+                    parts.append(" (%s)" % absence.internal_notes)
+                parts.append(": ")
+                parts.append(", ".join(day.strftime("%a %d.%m.%y") for day in in_range))
+                reasons[report.pk]["%s_notes" % field].append("".join(parts))
+
+        for pk, report_days in days.items():
+            result[pk] = {
+                **report_days,
+                **{field: "\n".join(reason) for field, reason in reasons[pk].items()},
+            }
+        return result
 
 
 @model_resource_urls()
@@ -1528,3 +2300,113 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.get_user_type_display()}"
+
+
+EXPORT_STORAGE = private_storage("zivinetz_exports")
+
+
+def export_storage():
+    """
+    Exports are written to the ``zivinetz_exports`` storage if it is
+    configured in ``settings.STORAGES`` and outside ``MEDIA_ROOT`` otherwise,
+    see ``zivinetz.utils.storage``
+    """
+    return EXPORT_STORAGE
+
+
+def export_job_upload_to(instance, filename):
+    return f"zivinetz-exports/{uuid.uuid4().hex}/{filename}"
+
+
+class ExportJobManager(models.Manager):
+    def claim(self):
+        """
+        Marks the oldest pending job as running and returns it
+
+        Jobs locked by other workers are skipped, ``None`` is returned if
+        there is nothing left to do.
+        """
+        with transaction.atomic():
+            job = (
+                self
+                .select_for_update(skip_locked=True)
+                .filter(status=ExportJob.PENDING)
+                .order_by("created_at", "pk")
+                .first()
+            )
+            if job is not None:
+                job.status = ExportJob.RUNNING
+                job.started_at = timezone.now()
+                job.save(update_fields=["status", "started_at"])
+        return job
+
+    def fail_stale(self, timeout):
+        """
+        Marks jobs which have been running for longer than ``timeout`` as
+        failed and returns them; their worker has most likely died
+
+        The jobs are not queued again, an export which crashes its worker
+        would otherwise do so over and over.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(
+                self.select_for_update(skip_locked=True).filter(
+                    status=ExportJob.RUNNING, started_at__lt=now - timeout
+                )
+            )
+            for job in jobs:
+                job.status = ExportJob.FAILED
+                job.finished_at = now
+                job.error = gettext("The export has been interrupted.")
+            self.bulk_update(jobs, ["status", "finished_at", "error"])
+        return jobs
+
+
+class ExportJob(models.Model):
+    PENDING = 10
+    RUNNING = 20
+    FINISHED = 30
+    FAILED = 40
+
+    STATUS_CHOICES = (
+        (PENDING, _("pending")),
+        (RUNNING, _("running")),
+        (FINISHED, _("finished")),
+        (FAILED, _("failed")),
+    )
+
+    created_at = models.DateTimeField(_("created at"), default=timezone.now)
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name=_("created by")
+    )
+    title = models.CharField(_("title"), max_length=200)
+    path = models.CharField(_("path"), max_length=1000)
+    query = models.TextField(_("query"), blank=True)
+    session = models.JSONField(_("session"), default=dict, blank=True)
+    site_url = models.CharField(_("site URL"), max_length=200, blank=True)
+    status = models.IntegerField(_("status"), choices=STATUS_CHOICES, default=PENDING)
+    started_at = models.DateTimeField(_("started at"), blank=True, null=True)
+    finished_at = models.DateTimeField(_("finished at"), blank=True, null=True)
+    file = models.FileField(
+        _("file"),
+        upload_to=export_job_upload_to,
+        storage=export_storage,
+        max_length=500,
+        blank=True,
+    )
+    language = models.CharField(_("language"), max_length=10, blank=True)
+    error = models.TextField(_("error"), blank=True)
+
+    objects = ExportJobManager()
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = _("export job")
+        verbose_name_plural = _("export jobs")
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse("zivinetz_exportjob_download", kwargs={"pk": self.pk})
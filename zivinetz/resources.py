@@ -31,6 +31,7 @@ from zivinetz.forms import (
     DrudgeSearchForm,
     EditExpenseReportForm,
     ExpenseReportSearchForm,
+    GroupReportsForm,
     JobReferenceForm,
     JobReferenceSearchForm,
     SpecificationForm,
@@ -39,6 +40,7 @@ from zivinetz.models import (
     Absence,
     Assessment,
     Assignment,
+    AssignmentChange,
     Drudge,
     ExpenseReport,
     Group,
@@ -49,10 +51,12 @@ from zivinetz.models import (
     RegionalOffice,
     ScopeStatement,
     Specification,
+    WeeklyOccupancy,
 )
+from zivinetz.utils.exports import BackgroundExportMixin
 from zivinetz.views.decorators import user_type_required
 from zivinetz.views.expenses import generate_expense_statistics_pdf
-from zivinetz.views.groups import create_groups_xlsx
+from zivinetz.views.groups import create_groups_range_xlsx, create_groups_xlsx
 
 
 class LimitedPickerView(resources.PickerView):
@@ -294,6 +298,10 @@ class AssignmentMixin(ZivinetzMixin):
 
         return AssignmentForm
 
+    def delete_selected(self, queryset):
+        with AssignmentChange.objects.collect():
+            return super().delete_selected(queryset)
+
     def form_valid(self, form):
         self.object = form.save()
         messages.success(
@@ -329,8 +337,9 @@ class AssignmentMixin(ZivinetzMixin):
                 ),
             )
 
-        for report in self.object.reports.all():
-            report.recalculate_total()
+        ExpenseReport.objects.recalculate_totals(
+            self.object.reports.select_related("assignment", "specification")
+        )
 
         if "date_until_extension" in form.changed_data and self.object.reports.exists():
             messages.warning(
@@ -374,7 +383,9 @@ class RemoveExpenseReportView(resources.ModelResourceView):
         return redirect(self.object)
 
 
-class PhonenumberPDFExportView(resources.ModelResourceView):
+class PhonenumberPDFExportView(BackgroundExportMixin, resources.ModelResourceView):
+    export_title = "Telefonliste"
+
     def get(self, request):
         self.object_list = self.get_queryset()
         search_form = AssignmentSearchForm(request.GET, request=request)
@@ -456,6 +467,9 @@ class GroupMixin(ZivinetzMixin):
         monday = GroupAssignment.objects.monday(date.today())
         return [(_("This week"), monday), (_("Next week"), monday + timedelta(days=7))]
 
+    def scope_statements(self):
+        return ScopeStatement.objects.filter(is_active=True)
+
 
 class AbsenceMixin(ZivinetzMixin):
     def get_form_class(self):
@@ -527,21 +541,27 @@ class ExpenseReportMixin(ZivinetzMixin):
         return ModelForm
 
     def form_valid(self, form):
-        self.object = form.save()
+        self.object = form.save(commit=False)
+        self.object.recalculate_total(save=False)
+        self.object.save()
         messages.success(
             self.request,
             _("The %(verbose_name)s has been successfully saved.")
             % self.object._meta.__dict__,
         )
-        self.object.recalculate_total()
 
         if self.request.POST.get("transport_expenses_copy"):
-            for report in self.object.assignment.reports.filter(
-                date_from__gt=self.object.date_from
-            ):
+            reports = list(
+                self.object.assignment.reports.filter(
+                    date_from__gt=self.object.date_from
+                ).select_related("assignment", "specification")
+            )
+            for report in reports:
                 report.transport_expenses = self.object.transport_expenses
                 report.transport_expenses_notes = self.object.transport_expenses_notes
-                report.recalculate_total()
+            ExpenseReport.objects.recalculate_totals(
+                reports, ["transport_expenses", "transport_expenses_notes"]
+            )
 
         if "_continue" in self.request.POST:
             return redirect(self.object.urls.url("edit"))
@@ -579,7 +599,9 @@ class ExpenseReportMixin(ZivinetzMixin):
         return self.render_to_response(context)
 
 
-class ExpenseReportPDFExportView(resources.ModelResourceView):
+class ExpenseReportPDFExportView(BackgroundExportMixin, resources.ModelResourceView):
+    export_title = "Spesenstatistik"
+
     def get(self, request):
         self.object_list = self.get_queryset()
         search_form = ExpenseReportSearchForm(request.GET, request=request)
@@ -592,11 +614,60 @@ class ExpenseReportPDFExportView(resources.ModelResourceView):
         return generate_expense_statistics_pdf(self.object_list)
 
 
-class AssignGroupsView(resources.ModelResourceView):
+class GroupReportsExportView(BackgroundExportMixin, resources.ModelResourceView):
     @method_decorator(user_type_required(["admin", "user_plus", "dev_admin"]))
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
 
+    def get_export_title(self):
+        return "Wochenrapporte {}-{}".format(
+            self.request.GET.get("date_from", ""),
+            self.request.GET.get("date_until", ""),
+        )
+
+    def get(self, request):
+        form = GroupReportsForm(request.GET)
+        if not form.is_valid():
+            messages.error(
+                request,
+                " ".join(error for errors in form.errors.values() for error in errors),
+            )
+            return redirect(self.url("list"))
+
+        response = HttpResponse(
+            save_virtual_workbook(
+                create_groups_range_xlsx(
+                    form.cleaned_data["date_from"],
+                    form.cleaned_data["date_until"],
+                    form.cleaned_data["scope_statements"],
+                )
+            ),
+            content_type=(
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            ),
+        )
+        response["Content-Disposition"] = 'attachment; filename="{}"'.format(
+            "wochenrapporte-{}-{}.xlsx".format(
+                form.cleaned_data["date_from"].isoformat(),
+                form.cleaned_data["date_until"].isoformat(),
+            ),
+        )
+        return response
+
+
+class AssignGroupsView(BackgroundExportMixin, resources.ModelResourceView):
+    @method_decorator(user_type_required(["admin", "user_plus", "dev_admin"]))
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def background_export_requested(self, request, *args, **kwargs):
+        return bool(request.GET.get("xlsx")) and super().background_export_requested(
+            request, *args, **kwargs
+        )
+
+    def get_export_title(self, year, month, day):
+        return f"Wochenrapport {year}-{month}-{day}"
+
     template_name = "zivinetz/assign_groups.html"
 
     def get_context_data(self, **kwargs):
@@ -654,6 +725,23 @@ class AssignGroupsView(resources.ModelResourceView):
                 print(exc)
                 return redirect(self.url("list"))
 
+        if "copy_forward" in request.POST:
+            try:
+                weeks = int(request.POST["copy_forward"])
+            except ValueError:
+                weeks = 0
+            if not 1 <= weeks <= 52:
+                messages.error(request, _("Enter a number of weeks between 1 and 52."))
+            else:
+                messages.success(
+                    request,
+                    _("Copied %s group assignments into the following weeks.")
+                    % GroupAssignment.objects.copy_forward(
+                        day, weeks, scope_statement=self.scope_statement
+                    ),
+                )
+            return redirect(request.get_full_path())
+
         form = AssignDrudgesToGroupsForm(
             request.POST, day=day, scope_statement=self.scope_statement
         )
@@ -697,7 +785,7 @@ assignment_url = resource_url_fn(
     Assignment,
     mixins=(AssignmentMixin,),
     decorators=(staff_member_required,),
-    deletion_cascade_allowed=(Assignment,),
+    deletion_cascade_allowed=(Assignment, WeeklyOccupancy),
 )
 group_url = resource_url_fn(
     Group,
@@ -817,6 +905,7 @@ urlpatterns = [
                 view=AssignGroupsView,
                 url=r"^(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})/$",
             ),
+            group_url("export", view=GroupReportsExportView, url=r"^export/$"),
             group_url("detail", url=r"^(?P<pk>\d+)/$"),
             group_url("add", url=r"^add/$"),
             group_url("edit"),
@@ -1,7 +1,16 @@
 from django.urls import include, path
 from django.views import generic
 
-from zivinetz.views import drudge, expenses, home, quota, reporting, scheduling
+from zivinetz.utils.exports import background_export
+from zivinetz.views import (
+    drudge,
+    expenses,
+    exports,
+    home,
+    quota,
+    reporting,
+    scheduling,
+)
 from zivinetz.views.decorators import user_type_required
 from zivinetz.views.drudge import (
     AssignmentCSVExportView,
@@ -37,7 +46,9 @@ urlpatterns = [
     ),
     path(
         "assignments/phone-list/",
-        admin_required(reporting.assignment_phone_list),
+        admin_required(
+            background_export("Telefonliste")(reporting.assignment_phone_list)
+        ),
         name="zivinetz_assignment_phone_list",
     ),
     path(
@@ -58,12 +69,26 @@ urlpatterns = [
     ),
     path(
         "expense_statistics_pdf/",
-        admin_dev_admin_required(expenses.expense_statistics_pdf),
+        admin_dev_admin_required(
+            background_export("Spesenstatistik")(expenses.expense_statistics_pdf)
+        ),
+    ),
+    path(
+        "exports/",
+        admin_required(exports.exportjob_list),
+        name="zivinetz_exportjob_list",
+    ),
+    path(
+        "exports/<int:pk>/",
+        admin_required(exports.exportjob_download),
+        name="zivinetz_exportjob_download",
     ),
     # Export URLs
     path(
         "admin/drudges/pdf/",
-        dev_admin_required(DrudgePDFExportView.as_view()),
+        dev_admin_required(
+            background_export("Zivildienstleistende")(DrudgePDFExportView.as_view())
+        ),
         name="drudge_export",
     ),
     path(
@@ -73,7 +98,9 @@ urlpatterns = [
     ),
     path(
         "admin/assignments/pdf/",
-        admin_required(AssignmentPDFExportView.as_view()),
+        admin_required(
+            background_export("Einsätze")(AssignmentPDFExportView.as_view())
+        ),
         name="assignment_export",
     ),
     path(
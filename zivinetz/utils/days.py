@@ -0,0 +1,159 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+
+ONE_DAY = timedelta(days=1)
+
+
+def weekend_days(date_from, date_until):
+    """Number of saturdays and sundays between both dates (inclusive)"""
+    if date_until < date_from:
+        return 0
+    full_weeks, remainder = divmod((date_until - date_from).days + 1, 7)
+    # Weekdays (0 = monday) of the remaining days after the full weeks
+    first = (date_from.weekday() + 7 * full_weeks) % 7
+    return 2 * full_weeks + sum(
+        1 for offset in range(remainder) if (first + offset) % 7 >= 5
+    )
+
+
+def _segments(date_from, date_until, until):
+    """
+    Yields ``(key, start, end)`` tuples for the monthly expense report
+    buckets of an assignment
+
+    The first bucket starts at ``date_from``, all others at the first of a
+    month, except for the part of an extension which falls into the same
+    month as the original ``date_until``.
+    """
+    start = date_from
+    while start <= until:
+        if start.month == 12:
+            next_month = date(start.year + 1, 1, 1)
+        else:
+            next_month = date(start.year, start.month + 1, 1)
+
+        end = min(next_month - ONE_DAY, until)
+        if start <= date_until < end:
+            # Extension inside the month of the original end
+            end = date_until
+
+        yield (start.year, start.month, start.day), start, end
+        start = end + ONE_DAY
+
+
+def _company_holiday_ranges(company_holidays, start, end):
+    """
+    Merged, sorted ``(from, until)`` ranges of company holidays clipped to
+    the interval ``[start, end]``
+    """
+    ranges = []
+    for holiday in sorted(company_holidays, key=lambda h: h.date_from):
+        if holiday.date_until < start or holiday.date_from > end:
+            continue
+        r_from, r_until = max(holiday.date_from, start), min(holiday.date_until, end)
+        if ranges and r_from <= ranges[-1][1] + ONE_DAY:
+            ranges[-1][1] = max(ranges[-1][1], r_until)
+        else:
+            ranges.append([r_from, r_until])
+    return ranges
+
+
+def assignment_days(
+    date_from, date_until, date_until_extension, public_holidays, company_holidays
+):
+    """
+    Classifies the days of an assignment
+
+    ``public_holidays`` is a sorted sequence of dates and may contain days
+    outside the assignment, ``company_holidays`` an iterable of objects
+    with ``date_from`` and ``date_until`` attributes (e.g.
+    ``CompanyHoliday`` instances).
+
+    Instead of visiting every day, each monthly bucket is split into runs
+    inside and outside of company holidays; weekends are counted in closed
+    form and public holidays are located with bisection. Returns the same
+    ``(days, monthly_expense_days)`` structure as
+    ``Assignment.assignment_days``.
+    """
+    until = date_until_extension or date_until
+
+    vacation_days = 0
+    # +1 because the range is inclusive
+    total_days = (date_until - date_from).days + 1
+
+    if total_days >= 180:
+        # 30 days isn't exactly one month. But that's good enough for us.
+        # We grant 2 additional vacation days per 30 full days only
+        # (see ZDV Art. 72)
+        vacation_days = 8 + int((total_days - 180) / 30) * 2
+
+    days = {
+        "assignment_days": total_days,
+        "vacation_days": vacation_days,
+        "company_holidays": 0,
+        "public_holidays_during_company_holidays": 0,
+        "public_holidays_outside_company_holidays": 0,
+        "vacation_days_during_company_holidays": 0,
+        "freely_definable_vacation_days": vacation_days,
+        "working_days": 0,
+        "countable_days": 0,
+        # days which aren't countable and are forced upon the drudge:
+        "forced_leave_days": 0,
+    }
+
+    def public_holidays_between(start, end):
+        return public_holidays[
+            bisect_left(public_holidays, start) : bisect_right(public_holidays, end)
+        ]
+
+    def weekend_or_public_holiday(start, end):
+        holidays = public_holidays_between(start, end)
+        return (
+            weekend_days(start, end) + sum(1 for day in holidays if day.weekday() < 5),
+            len(holidays),
+        )
+
+    ranges = _company_holiday_ranges(company_holidays, date_from, until)
+
+    monthly_expense_days = []
+    for key, start, end in _segments(date_from, date_until, until):
+        length = (end - start).days + 1
+        bucket = {"free": 0, "working": 0, "holi": 0, "forced": 0, "start": start}
+
+        company_days = company_free_days = 0
+        for range_from, range_until in ranges:
+            if range_until < start or range_from > end:
+                continue
+            r_from, r_until = max(range_from, start), min(range_until, end)
+            free, public = weekend_or_public_holiday(r_from, r_until)
+            company_days += (r_until - r_from).days + 1
+            company_free_days += free
+            days["public_holidays_during_company_holidays"] += public
+
+        # Company holidays which are neither public holidays nor weekends
+        # have to be covered by vacation days, in chronological order. If
+        # none are left the drudge has to pause his assignment.
+        company_working_days = company_days - company_free_days
+        holi = min(days["freely_definable_vacation_days"], company_working_days)
+        forced = company_working_days - holi
+        days["freely_definable_vacation_days"] -= holi
+        days["vacation_days_during_company_holidays"] += holi
+        days["forced_leave_days"] += forced
+        days["company_holidays"] += company_days
+
+        free, _public = weekend_or_public_holiday(start, end)
+        working = (length - company_days) - (free - company_free_days)
+        days["working_days"] += working
+        days["countable_days"] += length - forced
+
+        bucket.update({
+            "free": length - working - holi - forced,
+            "working": working,
+            "holi": holi,
+            "forced": forced,
+            "end": end,
+        })
+        monthly_expense_days.append((key, bucket))
+
+    return days, monthly_expense_days
@@ -0,0 +1,266 @@
+"""
+Background exports
+
+Large PDF and XLSX exports can be requested with an additional
+``background=1`` GET parameter. Instead of rendering the export inside the
+request an ``ExportJob`` is queued. The ``run_export_jobs`` management
+command replays the request (path, query string, user and persisted
+searches) without the ``background`` parameter, stores the response in the
+``file`` field of the job and notifies the user by email. The database is
+the queue, no broker is necessary. ``prune_export_jobs`` removes old jobs
+and their files.
+"""
+
+import logging
+import os
+import re
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.messages.storage import default_storage as message_storage
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.http import HttpRequest, QueryDict
+from django.shortcuts import redirect
+from django.urls import resolve, reverse
+from django.utils import timezone, translation
+from django.utils.module_loading import import_string
+from django.utils.text import get_valid_filename
+from django.utils.translation import gettext as _
+
+from zivinetz.middleware import override_current_request
+from zivinetz.models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_PARAMETER = "background"
+
+#: Jobs are listed for this many days and may be pruned afterwards
+RETENTION_DAYS = 14
+
+#: Jobs which are still running after this many minutes have been
+#: interrupted, e.g. because their worker has been killed
+STALE_MINUTES = 60
+
+#: Prefix of the session keys of searches persisted by towel
+SEARCH_SESSION_PREFIX = "sf_"
+
+FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+
+
+class ExportFailed(Exception):
+    pass
+
+
+def background_requested(request):
+    return request.method == "GET" and bool(request.GET.get(BACKGROUND_PARAMETER))
+
+
+def queue_export(request, title):
+    """Queues an export of the current request and redirects to the job list"""
+    query = request.GET.copy()
+    query.pop(BACKGROUND_PARAMETER, None)
+
+    ExportJob.objects.create(
+        created_by=request.user,
+        title=title,
+        path=request.path_info,
+        query=query.urlencode(),
+        # Towel's search forms fall back to searches persisted in the session,
+        # nothing else is needed to reproduce the export
+        session={
+            key: value
+            for key, value in request.session.items()
+            if key.startswith(SEARCH_SESSION_PREFIX)
+        },
+        site_url=request.build_absolute_uri("/").rstrip("/"),
+        language=translation.get_language() or "",
+    )
+    messages.success(
+        request,
+        _(
+            "The export %s is being created in the background. You will be"
+            " notified by email as soon as it is ready."
+        )
+        % title,
+    )
+    return redirect("zivinetz_exportjob_list")
+
+
+def background_export(title):
+    """Decorator for export views which may be run in the background"""
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _fn(request, *args, **kwargs):
+            if background_requested(request):
+                return queue_export(request, title)
+            return view_func(request, *args, **kwargs)
+
+        return _fn
+
+    return decorator
+
+
+class BackgroundExportMixin:
+    """Mixin for class-based export views which may be run in the background"""
+
+    export_title = ""
+
+    def background_export_requested(self, request, *args, **kwargs):
+        return background_requested(request)
+
+    def get_export_title(self, *args, **kwargs):
+        return self.export_title
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.background_export_requested(request, *args, **kwargs):
+            return queue_export(request, self.get_export_title(*args, **kwargs))
+        return super().dispatch(request, *args, **kwargs)
+
+
+def job_language(job):
+    return job.language or settings.LANGUAGE_CODE
+
+
+def export_request(job):
+    """Reconstructs the request which queued ``job``"""
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = job.path
+    request.GET = QueryDict(job.query)
+    request.user = job.created_by
+    request.LANGUAGE_CODE = job_language(job)
+
+    site = urlsplit(job.site_url)
+    request.META["HTTP_HOST"] = site.netloc or "localhost"
+    request.META["wsgi.url_scheme"] = site.scheme or "http"
+
+    session_store = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+    request.session = session_store()
+    request.session.update(job.session)
+    request._messages = message_storage(request)
+    return request
+
+
+def render_export(job):
+    """Returns the filename and the content of the export"""
+    request = export_request(job)
+    match = resolve(job.path)
+    # The current request is used e.g. when recording assignment changes
+    with override_current_request(request):
+        response = match.func(request, *match.args, **match.kwargs)
+        try:
+            disposition = response.get("Content-Disposition", "")
+            if response.status_code != 200 or not disposition:
+                raise ExportFailed(
+                    "; ".join(
+                        str(message) for message in messages.get_messages(request)
+                    )
+                    or _("The export could not be created (status %s).")
+                    % response.status_code
+                )
+            content = b"".join(response)
+        finally:
+            # Sends request_finished which closes obsolete database
+            # connections like at the end of a request; they are reopened
+            # when needed
+            response.close()
+
+    filename = FILENAME_RE.search(disposition)
+    return (
+        get_valid_filename(filename.group(1)) if filename else f"export-{job.pk}",
+        content,
+    )
+
+
+def run_export_job(job):
+    """Renders a claimed job and notifies its creator"""
+    # Exports are rendered in the language of the request which queued them
+    with translation.override(job_language(job)):
+        try:
+            filename, content = render_export(job)
+        except ExportFailed as exc:
+            job.status = ExportJob.FAILED
+            job.error = str(exc)
+        except Exception:
+            logger.exception("Export job %s failed", job.pk)
+            job.status = ExportJob.FAILED
+            job.error = _("The export could not be created because of an error.")
+        else:
+            job.file.save(filename, ContentFile(content), save=False)
+            job.status = ExportJob.FINISHED
+
+    job.finished_at = timezone.now()
+    job.session = {}
+    job.save()
+    notify(job)
+    return job
+
+
+def fail_stale_export_jobs(minutes=STALE_MINUTES):
+    """Marks interrupted jobs as failed and notifies their creators"""
+    jobs = ExportJob.objects.fail_stale(timedelta(minutes=minutes))
+    for job in jobs:
+        notify(job)
+    return jobs
+
+
+def notify(job):
+    if not job.created_by.email:
+        return
+
+    with translation.override(job_language(job)):
+        if job.status == ExportJob.FINISHED:
+            subject = _("Export %s is ready") % job.title
+            body = _("The export %(title)s is ready for download:\n\n%(url)s\n")
+        else:
+            subject = _("Export %s failed") % job.title
+            body = _(
+                "The export %(title)s could not be created. Details are"
+                " available on the list of exports:\n\n%(url)s\n"
+            )
+
+        EmailMessage(
+            subject=subject,
+            body=body
+            % {
+                "title": job.title,
+                "url": job.site_url
+                + (
+                    job.get_absolute_url()
+                    if job.status == ExportJob.FINISHED
+                    else reverse("zivinetz_exportjob_list")
+                ),
+            },
+            to=[job.created_by.email],
+            from_email="info@naturnetz.ch",
+        ).send()
+
+
+def prune_export_jobs(days=RETENTION_DAYS):
+    """
+    Removes jobs which have been created more than ``days`` days ago and
+    their files, returns the count of removed jobs
+    """
+    jobs = ExportJob.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=days)
+    ).exclude(status=ExportJob.RUNNING)
+
+    count = 0
+    for job in jobs:
+        if job.file:
+            storage, name = job.file.storage, job.file.name
+            job.file.delete(save=False)
+            try:
+                # Remove the directory which has been created for the file
+                os.rmdir(storage.path(os.path.dirname(name)))
+            except (NotImplementedError, OSError):
+                pass
+        job.delete()
+        count += 1
+    return count
@@ -0,0 +1,150 @@
+"""
+Content-addressed cache of rendered PDFs
+
+Views calculate a fingerprint of everything which goes into a PDF (field
+values, compensations, the modification times of template files, the
+signature date etc.). The rendering code itself is covered by
+``PDF_RENDER_VERSION`` and the installed versions of the PDF libraries;
+``PDF_RENDER_VERSION`` has to be increased whenever the layout or the texts
+of a PDF change. The rendered PDF is stored under this fingerprint. The fingerprint is sent as
+``ETag`` and the time of rendering as ``Last-Modified``, so that repeated
+downloads only cost a conditional request or a few calls on the storage.
+
+PDFs are written to the ``zivinetz_pdf_cache`` storage if it is configured
+in ``settings.STORAGES`` and outside ``MEDIA_ROOT`` otherwise, see
+``zivinetz.utils.storage``. The files contain personal data.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import lru_cache
+from importlib import metadata
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from zivinetz.utils.storage import private_storage
+
+
+CACHE_DIRECTORY = "zivinetz-pdf-cache"
+
+
+PDF_CACHE_STORAGE = private_storage("zivinetz_pdf_cache")
+
+
+def pdf_cache_storage():
+    return PDF_CACHE_STORAGE
+
+
+def instance_values(*instances):
+    """Returns the values of all concrete fields of the passed instances"""
+    return [
+        [
+            instance._meta.label,
+            *(
+                getattr(instance, field.attname)
+                for field in instance._meta.concrete_fields
+            ),
+        ]
+        if instance is not None
+        else None
+        for instance in instances
+    ]
+
+
+#: The fields of users appearing in PDFs. Other fields such as ``password``
+#: and ``last_login`` change often and do not affect the PDFs.
+USER_FIELDS = ("first_name", "last_name", "email")
+
+
+def user_values(user):
+    """Returns the values of the fields of ``user`` which are rendered"""
+    return [getattr(user, field) for field in USER_FIELDS]
+
+
+#: Increase this when changing the rendering code of any cached PDF, so that
+#: PDFs rendered by the old code are not served anymore.
+PDF_RENDER_VERSION = 1
+
+
+@lru_cache(maxsize=1)
+def library_versions():
+    versions = []
+    for distribution in ("pdfdocument", "reportlab", "pypdf"):
+        try:
+            versions.append(metadata.version(distribution))
+        except metadata.PackageNotFoundError:
+            versions.append(None)
+    return versions
+
+
+def fingerprint(*parts):
+    """
+    Returns a digest of ``parts``, anything which ``str`` can convert, the
+    ``PDF_RENDER_VERSION`` and the versions of the PDF libraries
+    """
+    return hashlib.sha256(
+        json.dumps(
+            [PDF_RENDER_VERSION, library_versions(), *parts],
+            default=str,
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+
+
+def cached_pdf_response(request, key, content_disposition, render):
+    """
+    Returns the PDF with the fingerprint ``key``
+
+    ``render`` is only called with a file-like object to write the PDF to
+    if the PDF does not exist in the cache yet. ``If-None-Match`` and
+    ``If-Modified-Since`` are evaluated together so that the precedence of
+    RFC 9110 applies: ``If-Modified-Since`` is ignored when the request
+    contains ``If-None-Match``.
+    """
+    etag = quote_etag(key)
+    storage = pdf_cache_storage()
+    name = f"{CACHE_DIRECTORY}/{key[:2]}/{key}.pdf"
+    if not storage.exists(name):
+        output = BytesIO()
+        render(output)
+        name = storage.save(name, ContentFile(output.getvalue()))
+
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(
+            storage.open(name, "rb"), content_type="application/pdf"
+        )
+        response["Content-Disposition"] = content_disposition
+    response["Last-Modified"] = http_date(last_modified)
+
+    response["ETag"] = etag
+    # The PDFs contain personal data, browsers have to revalidate them
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def prune_pdf_cache(days):
+    """
+    Removes PDFs which have been rendered more than ``days`` days ago,
+    returns the count of removed files
+    """
+    storage = pdf_cache_storage()
+    if not storage.exists(CACHE_DIRECTORY):
+        return 0
+
+    threshold = timezone.now() - timedelta(days=days)
+    count = 0
+    for directory in storage.listdir(CACHE_DIRECTORY)[0]:
+        path = f"{CACHE_DIRECTORY}/{directory}"
+        for name in storage.listdir(path)[1]:
+            if storage.get_modified_time(f"{path}/{name}") < threshold:
+                storage.delete(f"{path}/{name}")
+                count += 1
+    return count
@@ -0,0 +1,81 @@
+"""
+Denormalized search documents
+
+Every searchable model stores the lowercased values of its manager's
+``search_fields`` (including fields of related models) in a
+``search_document`` column with a trigram index. When the
+``ZIVINETZ_SEARCH_BACKEND`` setting is ``"document"`` searches run a
+``LIKE`` per keyword on this single indexed column instead of
+``icontains`` lookups on all search fields.
+
+The documents are only maintained while the document backend is active.
+The migration adding them fills them if the backend is active already, run
+``rebuild_search_documents`` when activating it later.
+"""
+
+from django.conf import settings
+from django.db.models import Func, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Lower
+from towel.managers import normalize_query
+
+
+#: Separates the field values so that keywords never match across fields
+SEPARATOR = "\x1f"
+
+
+def search_document_expression(fields):
+    """Lowercased values of all ``fields``, separated by ``SEPARATOR``"""
+    return Lower(
+        Func(Value(SEPARATOR), *fields, function="CONCAT_WS", output_field=TextField())
+    )
+
+
+def document_backend_active():
+    return getattr(settings, "ZIVINETZ_SEARCH_BACKEND", "fields") == "document"
+
+
+def update_search_documents(queryset, *, force=False):
+    """
+    Recalculates the search documents of all rows in ``queryset`` using a
+    single ``UPDATE`` statement
+
+    Nothing happens unless the document backend is active or ``force`` is
+    set.
+    """
+    if not (force or document_backend_active()):
+        return 0
+
+    model = queryset.model
+    return queryset.update(
+        search_document=Subquery(
+            model._base_manager
+            .filter(pk=OuterRef("pk"))
+            .order_by()
+            .annotate(
+                document=search_document_expression(
+                    model._default_manager.search_fields
+                )
+            )
+            .values("document")[:1]
+        )
+    )
+
+
+class SearchDocumentMixin:
+    """
+    Mixin for towel's ``SearchManager`` searching the ``search_document``
+    column if the document backend is active
+    """
+
+    def search(self, query):
+        if not document_backend_active():
+            return super().search(query)
+
+        queryset = self.all()
+        for keyword in normalize_query(query or ""):
+            negate = keyword[0] == "-" and len(keyword) > 1
+            term = keyword[1:] if keyword[0] in "+-" and len(keyword) > 1 else keyword
+            q = Q(search_document__contains=term.lower())
+            queryset = queryset.filter(~q if negate else q)
+
+        return queryset
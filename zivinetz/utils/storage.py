@@ -0,0 +1,59 @@
+"""
+Storages for files containing personal data
+
+Exports and cached PDFs contain addresses, phone numbers and bank accounts
+of drudges. They are written to a storage configured in
+``settings.STORAGES`` if there is one (e.g. ``zivinetz_exports``) and below
+``settings.ZIVINETZ_PRIVATE_ROOT`` otherwise. ``ZIVINETZ_PRIVATE_ROOT``
+defaults to a ``zivinetz-private`` directory next to ``MEDIA_ROOT``; it
+must not be served by the web server.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+
+
+_private_storages = []
+
+
+def private_root():
+    root = getattr(settings, "ZIVINETZ_PRIVATE_ROOT", None)
+    if root:
+        return root
+    return os.path.join(
+        os.path.dirname(os.path.abspath(settings.MEDIA_ROOT)), "zivinetz-private"
+    )
+
+
+class PrivateStorage(LazyObject):
+    def __init__(self, alias):
+        self.__dict__["alias"] = alias
+        super().__init__()
+
+    def _setup(self):
+        if self.alias in settings.STORAGES:
+            self._wrapped = storages[self.alias]
+        else:
+            self._wrapped = FileSystemStorage(location=private_root())
+
+
+def private_storage(alias):
+    """
+    Returns a storage which uses ``alias`` from ``settings.STORAGES`` if it
+    is configured and a file system storage outside ``MEDIA_ROOT`` otherwise
+    """
+    storage = PrivateStorage(alias)
+    _private_storages.append(storage)
+    return storage
+
+
+@receiver(setting_changed)
+def reset_private_storages(*, setting, **kwargs):
+    if setting in {"STORAGES", "MEDIA_ROOT", "ZIVINETZ_PRIVATE_ROOT"}:
+        for storage in _private_storages:
+            storage._wrapped = empty
@@ -0,0 +1,71 @@
+"""
+Calendar weeks according to ISO 8601
+
+All lookups go through a table of ``(year, week, monday)`` tuples per
+calendar year which is built once per process and year.
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+
+
+ONE_DAY = timedelta(days=1)
+ONE_WEEK = timedelta(days=7)
+
+
+@lru_cache(maxsize=64)
+def _year_table(year):
+    """
+    Returns the ordinal of the first of january and a tuple containing the
+    ``(year, week, monday)`` of every day of ``year``
+    """
+    day = date(year, 1, 1)
+    first = day.toordinal()
+    table = []
+    while day.year == year:
+        iso_year, week, weekday = day.isocalendar()
+        table.append((iso_year, week, day - timedelta(days=weekday - 1)))
+        day += ONE_DAY
+    return first, tuple(table)
+
+
+def week_info(day):
+    """Returns ``(year, week, monday)`` of the calendar week containing ``day``"""
+    first, table = _year_table(day.year)
+    return table[day.toordinal() - first]
+
+
+def calendar_week(day):
+    """Returns ``(year, week)`` of the calendar week containing ``day``"""
+    return week_info(day)[:2]
+
+
+def week_monday(day):
+    """Returns the monday of the calendar week containing ``day``"""
+    return week_info(day)[2]
+
+
+def week_mondays(date_from, date_until):
+    """
+    Returns the mondays of all calendar weeks from the week containing
+    ``date_from`` up to and including ``date_until``
+    """
+    mondays = []
+    monday = week_monday(date_from)
+    while monday <= date_until:
+        mondays.append(monday)
+        monday += ONE_WEEK
+    return mondays
+
+
+def week_days(date_from, date_until):
+    """
+    Yields ``(monday, days)`` for every calendar week overlapping the
+    interval ``[date_from, date_until]`` where ``days`` is the number of
+    days of the interval inside that week
+    """
+    monday = week_monday(date_from)
+    while monday <= date_until:
+        sunday = monday + timedelta(days=6)
+        yield monday, (min(date_until, sunday) - max(date_from, monday)).days + 1
+        monday += ONE_WEEK
@@ -1,4 +1,5 @@
 import csv
+import itertools
 import os
 from datetime import date, datetime
 from io import BytesIO
@@ -9,7 +10,13 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect
+from django.db.models import Avg, Exists, OuterRef, Subquery
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
 from django.utils import timezone
 from django.utils.translation import gettext as _, gettext_lazy
@@ -22,11 +29,69 @@ from reportlab.pdfgen import canvas
 from towel.forms import towel_formfield_callback
 
 from zivinetz.forms import AssignmentSearchForm, DrudgeSearchForm
-from zivinetz.models import Assignment, Codeword, Drudge, ExpenseReport, RegionalOffice
+from zivinetz.models import (
+    Assessment,
+    Assignment,
+    Codeword,
+    Drudge,
+    ExpenseReport,
+    RegionalOffice,
+)
 from zivinetz.views.base import BaseView
 from zivinetz.views.decorators import drudge_required
 
 
+#: Rows fetched from the database at once by the streaming CSV exports
+EXPORT_CHUNK_SIZE = 500
+
+
+class Echo:
+    """File-like object returning what is written instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def streaming_csv_response(rows, filename):
+    """
+    Returns a response writing the CSV rows while they are produced, so that
+    memory use stays flat and the download starts immediately
+    """
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows), content_type="text/csv"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def annotate_drudge_export(queryset):
+    """
+    Annotates whether drudges are in an active assignment today and the
+    average mark of all assessments of their assignments, so that the
+    exports need a constant number of queries
+    """
+    today = date.today()
+    return queryset.annotate(
+        has_active_assignment=Exists(
+            Assignment.objects.filter(
+                drudge=OuterRef("pk"),
+                status__in=(Assignment.ARRANGED, Assignment.MOBILIZED),
+                date_from__lte=today,
+                date_until__gte=today,
+            )
+        ),
+        average_mark=Subquery(
+            Assessment.objects
+            .filter(assignment__drudge=OuterRef("pk"))
+            .order_by()
+            .values("assignment__drudge")
+            .annotate(average=Avg("mark"))
+            .values("average")
+        ),
+    )
+
+
 class AssignmentExportSearchForm(forms.Form):
     status = forms.ChoiceField(
         choices=Assignment.STATUS_CHOICES, required=False, label=_("Status")
@@ -372,21 +437,14 @@ class AssignmentCSVExportView(AssignmentExportBaseView):
 
         queryset = self.get_prepared_data()
 
-        # Create CSV response
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="assignment_list.csv"'
-
-        # Create CSV writer
-        writer = csv.writer(response)
-
-        # Write header row
-        writer.writerow(self.get_header_row())
-
-        # Write data rows
-        for assignment in queryset:
-            writer.writerow(self.format_row(assignment))
-
-        return response
+        rows = itertools.chain(
+            [self.get_header_row()],
+            (
+                self.format_row(assignment)
+                for assignment in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            ),
+        )
+        return streaming_csv_response(rows, "assignment_list.csv")
 
     def get_header_row(self):
         """Get the CSV header row."""
@@ -515,14 +573,8 @@ class DrudgePDFExportView(BaseView):
 
     def get_active_status(self, drudge):
         """Get the current status of a drudge based on their active assignments."""
-        # Check for active assignments
-        active_assignments = drudge.assignments.filter(
-            status__in=(Assignment.ARRANGED, Assignment.MOBILIZED),
-            date_from__lte=date.today(),
-            date_until__gte=date.today(),
-        )
-
-        if active_assignments.exists():
+        # Annotated by annotate_drudge_export()
+        if drudge.has_active_assignment:
             return "Aufgeboten"
         return (
             drudge.get_status_display()
@@ -588,10 +640,9 @@ class DrudgePDFExportView(BaseView):
             self
             .get_queryset()
             .select_related("user", "regional_office")
-            .prefetch_related(
-                "assignments", "assignments__specification", "assignments__assessments"
-            )
+            .prefetch_related("assignments", "assignments__specification")
         )
+        queryset = annotate_drudge_export(queryset)
 
         # Create PDF
         response = HttpResponse(content_type="application/pdf")
@@ -674,17 +725,11 @@ class DrudgePDFExportView(BaseView):
                     y = height - margin
                     p.setFont(font_name, 9)
 
-                # Calculate average mark from assessments (using prefetched data)
-                avg_mark = None
-                total_mark = 0
-                count = 0
-                for assignment in drudge.assignments.all():
-                    for assessment in assignment.assessments.all():
-                        if assessment.mark is not None:
-                            total_mark += assessment.mark
-                            count += 1
-                if count > 0:
-                    avg_mark = round(total_mark / count, 1)
+                avg_mark = (
+                    None
+                    if drudge.average_mark is None
+                    else round(drudge.average_mark, 1)
+                )
 
                 # Format assignments (using prefetched data)
                 assignments_list = []
@@ -869,14 +914,8 @@ class DrudgeCSVExportView(BaseView):
 
     def get_active_status(self, drudge):
         """Get the current status of a drudge based on their active assignments."""
-        # Check for active assignments
-        active_assignments = drudge.assignments.filter(
-            status__in=(Assignment.ARRANGED, Assignment.MOBILIZED),
-            date_from__lte=date.today(),
-            date_until__gte=date.today(),
-        )
-
-        if active_assignments.exists():
+        # Annotated by annotate_drudge_export()
+        if drudge.has_active_assignment:
             return "Aufgeboten"
         return (
             drudge.get_status_display()
@@ -890,25 +929,26 @@ class DrudgeCSVExportView(BaseView):
                 _("You don't have permission to access this page.")
             )
 
-        # Get filtered queryset with prefetched related data
+        # Get filtered queryset with related data prefetched per chunk
         queryset = (
             self
             .get_queryset()
             .select_related("user", "regional_office")
-            .prefetch_related(
-                "assignments", "assignments__specification", "assignments__assessments"
-            )
+            .prefetch_related("assignments", "assignments__specification")
         )
+        queryset = annotate_drudge_export(queryset)
+        rows = itertools.chain(
+            [self.get_header_row()],
+            (
+                self.format_row(drudge)
+                for drudge in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            ),
+        )
+        return streaming_csv_response(rows, "drudge_list.csv")
 
-        # Create CSV response
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="drudge_list.csv"'
-
-        # Create CSV writer
-        writer = csv.writer(response)
-
-        # Write header row
-        writer.writerow([
+    def get_header_row(self):
+        """Get the CSV header row."""
+        return [
             _("ZDP-Nr."),
             _("Nachname"),
             _("Vorname"),
@@ -919,53 +959,42 @@ class DrudgeCSVExportView(BaseView):
             _("Bildung/Beruf"),
             _("Durchschnittsnote"),
             _("Alle Einsätze"),
-        ])
-
-        # Write data rows
-        for drudge in queryset:
-            # Calculate average mark
-            avg_mark = None
-            total_mark = 0
-            count = 0
-            for assignment in drudge.assignments.all():
-                for assessment in assignment.assessments.all():
-                    if assessment.mark is not None:
-                        total_mark += assessment.mark
-                        count += 1
-            if count > 0:
-                avg_mark = round(total_mark / count, 1)
-
-            # Format assignments
-            assignments_list = []
-            for assignment in drudge.assignments.all():
-                date_from = (
-                    assignment.date_from.strftime("%d.%m.%Y")
-                    if assignment.date_from
-                    else "-"
-                )
-                date_until = (
-                    assignment.determine_date_until().strftime("%d.%m.%Y")
-                    if assignment.determine_date_until()
-                    else "-"
-                )
-                assignments_list.append(
-                    f"{assignment.specification.code} ({date_from} - {date_until})"
-                )
+        ]
 
-            assignments_str = "; ".join(assignments_list) if assignments_list else "-"
-
-            # Write row
-            writer.writerow([
-                drudge.zdp_no,
-                drudge.user.last_name,
-                drudge.user.first_name,
-                self.get_active_status(drudge),
-                drudge.regional_office.name if drudge.regional_office else "-",
-                "Ja" if drudge.environment_course else "Nein",
-                "Ja" if drudge.motor_saw_course else "Nein",
-                drudge.education_occupation or "-",
-                str(avg_mark) if avg_mark is not None else "-",
-                assignments_str,
-            ])
+    def format_row(self, drudge):
+        """Format a single row for CSV export."""
+        avg_mark = (
+            None if drudge.average_mark is None else round(drudge.average_mark, 1)
+        )
 
-        return response
+        # Format assignments
+        assignments_list = []
+        for assignment in drudge.assignments.all():
+            date_from = (
+                assignment.date_from.strftime("%d.%m.%Y")
+                if assignment.date_from
+                else "-"
+            )
+            date_until = (
+                assignment.determine_date_until().strftime("%d.%m.%Y")
+                if assignment.determine_date_until()
+                else "-"
+            )
+            assignments_list.append(
+                f"{assignment.specification.code} ({date_from} - {date_until})"
+            )
+
+        assignments_str = "; ".join(assignments_list) if assignments_list else "-"
+
+        return [
+            drudge.zdp_no,
+            drudge.user.last_name,
+            drudge.user.first_name,
+            self.get_active_status(drudge),
+            drudge.regional_office.name if drudge.regional_office else "-",
+            "Ja" if drudge.environment_course else "Nein",
+            "Ja" if drudge.motor_saw_course else "Nein",
+            drudge.education_occupation or "-",
+            str(avg_mark) if avg_mark is not None else "-",
+            assignments_str,
+        ]
@@ -85,24 +85,19 @@ def generate_expense_statistics_pdf(reports):
     data = OrderedDict()
 
     for report in reports.order_by("date_from", "assignment__drudge").select_related(
-        "assignment__specification__scope_statement", "assignment__drudge__user"
+        "specification",
+        "assignment__specification__scope_statement",
+        "assignment__drudge__user",
     ):
-        compensation = report.compensation_data()
-        if not compensation:
+        table = report.compensation_table()
+        if not table:
             # Attention! Using current date instead of real mobilization date
-            compensation = report.compensation_data(date.today())
-            if not compensation:
-                continue
+            table = report.compensation_table(date.today())
 
-        def add(keys, compensation=compensation):
-            return sum(compensation[k] for k in keys.split())
-
-        tpl = (
-            "spending_money accomodation_%(t)s breakfast_%(t)s lunch_%(t)s supper_%(t)s"
+        working_day, free_day, sick_day = (
+            report.spending_money + table.daily[day_type]
+            for day_type in ("working", "free", "sick")
         )
-        working_day = add(tpl % {"t": "working"})
-        free_day = add(tpl % {"t": "free"})
-        sick_day = add(tpl % {"t": "sick"})
 
         line = [
             report.assignment.drudge.zdp_no,
@@ -0,0 +1,35 @@
+import os
+from datetime import timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+
+from zivinetz.models import ExportJob
+from zivinetz.utils.exports import RETENTION_DAYS
+
+
+@login_required
+def exportjob_list(request):
+    jobs = ExportJob.objects.filter(
+        created_by=request.user,
+        created_at__gte=timezone.now() - timedelta(days=RETENTION_DAYS),
+    )
+
+    return render(request, "zivinetz/exportjob_list.html", {"job_list": jobs})
+
+
+@login_required
+def exportjob_download(request, pk):
+    job = get_object_or_404(
+        ExportJob, pk=pk, created_by=request.user, status=ExportJob.FINISHED
+    )
+    if not job.file:
+        raise Http404
+
+    return FileResponse(
+        job.file.open("rb"),
+        as_attachment=True,
+        filename=os.path.basename(job.file.name),
+    )
@@ -1,3 +1,4 @@
+import re
 from collections import defaultdict
 from datetime import timedelta
 
@@ -7,6 +8,7 @@ from openpyxl import Workbook
 from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
 
 from zivinetz.models import Absence, Assignment, Group, GroupAssignment
+from zivinetz.utils.weeks import calendar_week, week_mondays
 
 
 letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
@@ -21,15 +23,11 @@ def c(column, row):
     return f"{columns[column]}{row + 1}"
 
 
-def create_groups_xlsx(day):
-    activate("de")
-
-    day = GroupAssignment.objects.monday(day)
-    days = [day + timedelta(days=i) for i in range(5)]
-
-    wb = Workbook()
-    ws = wb.active
-
+def add_named_styles(wb):
+    """
+    Adds the named styles of the weekly group report to the workbook if they
+    do not exist yet and returns a dictionary of all of them
+    """
     thin_border = Side(border_style="thin", color="00000000")
     medium_border = Side(border_style="medium", color="00000000")
     font = Font(name="Calibri", size=14)
@@ -37,7 +35,6 @@ def create_groups_xlsx(day):
     centered = NamedStyle("centered")
     centered.font = font
     centered.alignment = Alignment(horizontal="center", vertical="center")
-    wb.add_named_style(centered)
 
     dark = NamedStyle("dark")
     dark.font = font
@@ -45,13 +42,11 @@ def create_groups_xlsx(day):
     dark.border = Border(
         top=thin_border, right=thin_border, bottom=thin_border, left=thin_border
     )
-    wb.add_named_style(dark)
 
     darker = NamedStyle("darker")
     darker.border = Border(top=thin_border, bottom=thin_border)
     darker.font = Font(name="Calibri", size=14, bold=True)
     darker.fill = PatternFill("solid", "aaaaaa")
-    wb.add_named_style(darker)
 
     darker_border_left = NamedStyle("darkerBorderLeft")
     darker_border_left.border = Border(
@@ -59,36 +54,160 @@ def create_groups_xlsx(day):
     )
     darker_border_left.font = darker.font
     darker_border_left.fill = darker.fill
-    wb.add_named_style(darker_border_left)
 
-    border = NamedStyle("borderThickLeft")
-    border.border = Border(
+    border_thick_left = NamedStyle("borderThickLeft")
+    border_thick_left.border = Border(
         top=thin_border, right=thin_border, bottom=thin_border, left=medium_border
     )
-    border.font = font
-    wb.add_named_style(border)
-
-    border = NamedStyle("borderThickBottom")
-    border.border = Border(bottom=medium_border)
-    border.font = font
-    wb.add_named_style(border)
-
-    border = NamedStyle("borderThinLeft")
-    border.border = Border(left=thin_border)
-    border.font = font
-    wb.add_named_style(border)
-
-    border = NamedStyle("borderThinBottom")
-    border.border = Border(bottom=thin_border)
-    border.font = font
-    wb.add_named_style(border)
-
-    borderThin = NamedStyle("borderThin")
-    borderThin.border = Border(
+    border_thick_left.font = font
+
+    border_thick_bottom = NamedStyle("borderThickBottom")
+    border_thick_bottom.border = Border(bottom=medium_border)
+    border_thick_bottom.font = font
+
+    border_thin_left = NamedStyle("borderThinLeft")
+    border_thin_left.border = Border(left=thin_border)
+    border_thin_left.font = font
+
+    border_thin_bottom = NamedStyle("borderThinBottom")
+    border_thin_bottom.border = Border(bottom=thin_border)
+    border_thin_bottom.font = font
+
+    border_thin = NamedStyle("borderThin")
+    border_thin.border = Border(
         top=thin_border, right=thin_border, bottom=thin_border, left=thin_border
     )
-    borderThin.font = font
-    wb.add_named_style(borderThin)
+    border_thin.font = font
+
+    styles = {}
+    for style in [
+        centered,
+        dark,
+        darker,
+        darker_border_left,
+        border_thick_left,
+        border_thick_bottom,
+        border_thin_left,
+        border_thin_bottom,
+        border_thin,
+    ]:
+        if style.name not in wb.named_styles:
+            wb.add_named_style(style)
+        styles[style.name] = style
+    return styles
+
+
+class WeeklyGroupData:
+    """
+    Groups, group assignments, assignments and absences of all calendar
+    weeks from the week containing ``date_from`` up to ``date_until``
+
+    Everything is fetched upfront using one query each, the weekly reports
+    are assembled in memory.
+    """
+
+    def __init__(self, date_from, date_until):
+        self.mondays = week_mondays(date_from, date_until)
+        first, last = self.mondays[0], self.mondays[-1]
+
+        self.groups = list(Group.objects.active())
+
+        self.group_assignments = defaultdict(list)
+        for ga in GroupAssignment.objects.filter(week__in=self.mondays).select_related(
+            "assignment__drudge__user", "assignment__specification"
+        ):
+            self.group_assignments[ga.week].append(ga)
+
+        self.assignments = list(
+            Assignment.objects.overlapping(first, last).select_related(
+                "drudge__user", "specification"
+            )
+        )
+
+        self.absences = defaultdict(dict)
+        for absence in Absence.objects.filter(
+            days__overlap=[
+                monday + timedelta(days=i) for monday in self.mondays for i in range(5)
+            ]
+        ):
+            for day in absence.days:
+                self.absences[absence.assignment_id][day] = absence
+
+    def week(self, monday, scope_statement=None):
+        """
+        Returns the assignments per group and the assignments without a group
+        of the week starting on ``monday``, optionally only those belonging
+        to ``scope_statement``
+        """
+
+        def include(assignment):
+            return (
+                scope_statement is None
+                or assignment.specification.scope_statement_id == scope_statement.pk
+            )
+
+        assignments = defaultdict(list)
+        seen_assignments = set()
+        for ga in self.group_assignments[monday]:
+            if include(ga.assignment):
+                assignments[ga.group_id].append(ga.assignment)
+            seen_assignments.add(ga.assignment_id)
+
+        # Same conditions as in Assignment.objects.for_date
+        free_assignments = [
+            assignment
+            for assignment in self.assignments
+            if assignment.date_from <= monday <= assignment.determine_date_until()
+            and assignment.pk not in seen_assignments
+            and include(assignment)
+        ]
+        return assignments, free_assignments
+
+
+def create_groups_xlsx(day):
+    wb = Workbook()
+    add_groups_sheet(wb.active, day, WeeklyGroupData(day, day))
+    return wb
+
+
+def create_groups_range_xlsx(date_from, date_until, scope_statements=()):
+    """
+    Returns a workbook containing a sheet per calendar week from the week
+    containing ``date_from`` up to ``date_until``, or a sheet per week and
+    scope statement if ``scope_statements`` is not empty
+    """
+    data = WeeklyGroupData(date_from, date_until)
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for monday in data.mondays:
+        for scope_statement in scope_statements or [None]:
+            title = "%s KW %02d" % calendar_week(monday)
+            if scope_statement is not None:
+                title = f"{title} {scope_statement.name}"
+            # Excel does not allow some characters and titles longer than 31
+            # characters, openpyxl appends a number to duplicate titles
+            title = re.sub(r"[\\/*?:\[\]]", " ", title)[:28]
+            add_groups_sheet(wb.create_sheet(title), monday, data, scope_statement)
+    return wb
+
+
+def add_groups_sheet(ws, day, data, scope_statement=None):
+    """
+    Writes the weekly group report of the week containing ``day`` into the
+    worksheet ``ws`` using the preloaded ``data``
+
+    The empty grid of the day columns is styled using column styles instead
+    of assigning a named style to every single cell. Only cells which are
+    actually written to are styled individually.
+    """
+    activate("de")
+
+    day = GroupAssignment.objects.monday(day)
+    days = [day + timedelta(days=i) for i in range(5)]
+
+    styles = add_named_styles(ws.parent)
+    centered = styles["centered"]
 
     vertical_text = Alignment(text_rotation=90)
 
@@ -112,6 +231,16 @@ def create_groups_xlsx(day):
     def column_width(column, width):
         ws.column_dimensions[columns[column]].width = width
 
+    def column_style(column, style):
+        dimension = ws.column_dimensions[columns[column]]
+        dimension.font = styles[style].font
+        dimension.fill = styles[style].fill
+        dimension.border = styles[style].border
+
+    def set_day(weekday, row, value):
+        ws[c(day_column(weekday), row)] = value
+        ws[c(day_column(weekday), row)].style = "borderThickLeft"
+
     def row_height(row, height):
         ws.row_dimensions[row + 1].height = height
 
@@ -136,8 +265,8 @@ def create_groups_xlsx(day):
             ws[c(day_column(5), i + 1)].style = "borderThickLeft"
 
         if i < 2:
-            ws[c(0, i + 1)].style = centered
-            ws[c(day_column(5), i + 1)].style = centered
+            ws[c(0, i + 1)].style = "centered"
+            ws[c(day_column(5), i + 1)].style = "centered"
 
     column_width(0, 35)
     column_width(1, 15)
@@ -157,21 +286,22 @@ def create_groups_xlsx(day):
     for i, current in enumerate(days):
         ws[c(day_column(i), 0)] = date_format(current, "l")
         ws[c(day_column(i), 1)] = date_format(current, "d.m.y")
-        ws[c(day_column(i), 0)].style = centered
+        ws[c(day_column(i), 0)].style = "centered"
         ws[c(day_column(i), 1)].style = "borderThickBottom"
         ws[c(day_column(i), 1)].alignment = centered.alignment
         ws.merge_cells(f"{c(day_column(i), 0)}:{c(day_column(i + 1) - 1, 0)}")
         ws.merge_cells(f"{c(day_column(i), 1)}:{c(day_column(i + 1) - 1, 1)}")
+        # Keep the column styles of the grid out of the merged day names
+        for j in range(1, 9):
+            ws[c(day_column(i) + j, 0)].style = "centered"
 
-        ws[c(day_column(i), 2)] = "Absenz"
-        for k in range(2, 499):
-            ws[c(day_column(i), k)].style = "borderThickLeft"
-            ws[c(day_column(i) + 1, k)].style = "borderThin"
+        set_day(i, 2, "Absenz")
+        column_style(day_column(i), "borderThickLeft")
         for j in range(1, 9):
             ws[c(day_column(i) + j, 2)] = "%s)" % j
             style = "borderThin" if j % 2 else "dark"
-            for k in range(2, 499):
-                ws[c(day_column(i) + j, k)].style = style
+            ws[c(day_column(i) + j, 2)].style = style
+            column_style(day_column(i) + j, style)
 
             ws[c(day_column(i) + j, 2)].alignment = vertical_text
             column_width(day_column(i) + j, 7)
@@ -185,25 +315,8 @@ def create_groups_xlsx(day):
     # ZIVIS line
     style_row(5, "darker")
 
-    assignments = defaultdict(list)
-    seen_assignments = set()
-    for ga in GroupAssignment.objects.filter(week=day).select_related(
-        "assignment__drudge__user"
-    ):
-        assignments[ga.group_id].append(ga.assignment)
-        seen_assignments.add(ga.assignment_id)
-
-    free_assignments = (
-        Assignment.objects
-        .for_date(day)
-        .exclude(pk__in=seen_assignments)
-        .select_related("drudge__user")
-    )
-
-    absences = defaultdict(dict)
-    for absence in Absence.objects.filter(days__overlap=days):
-        for day in absence.days:
-            absences[absence.assignment_id][day] = absence
+    assignments, free_assignments = data.week(day, scope_statement)
+    absences = data.absences
 
     def add_group(row, group_name, assignments):
         ws[c(0, row)] = group_name
@@ -231,13 +344,11 @@ def create_groups_xlsx(day):
 
             for i, current in enumerate(days):
                 if current < assignment.date_from:
-                    ws[c(day_column(i), row)] = "Vor Beginn"
+                    set_day(i, row, "Vor Beginn")
                 elif current > assignment.determine_date_until():
-                    ws[c(day_column(i), row)] = "Nach Ende"
+                    set_day(i, row, "Nach Ende")
                 elif current in absences[assignment.id]:
-                    ws[c(day_column(i), row)] = absences[assignment.id][
-                        current
-                    ].pretty_reason()
+                    set_day(i, row, absences[assignment.id][current].pretty_reason())
 
         # Skip some lines
         for _i in range(max(3, 6 - len(assignments))):
@@ -252,8 +363,6 @@ def create_groups_xlsx(day):
         return row
 
     row = 6
-    for group in Group.objects.active():
+    for group in data.groups:
         row = add_group(row, group.name, assignments[group.id])
     row = add_group(row, "Nicht zugeteilt", free_assignments)
-
-    return wb
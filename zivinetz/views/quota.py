@@ -1,94 +1,175 @@
-from collections import OrderedDict, defaultdict
 from datetime import date, timedelta
 
-from django import forms
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
 from django.shortcuts import redirect, render
-from django.utils.translation import gettext as _, gettext_lazy
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext as _
 
 from zivinetz.models import DrudgeQuota, ScopeStatement
+from zivinetz.utils.weeks import week_monday, week_mondays
 
 
-def yield_dates(start, step, count):
-    for i in range(count):
-        yield start + timedelta(days=step * i)
+class QuotaGrid:
+    """
+    Quotas of a list of scope statements and weeks
 
+    Replaces a form per cell: The values are kept in one list per scope
+    statement, the posted values are validated in one pass and the inputs
+    are rendered directly instead of through bound fields. Any number of
+    weeks is supported.
+    """
 
-class QuotaForm(forms.Form):
-    quota = forms.IntegerField(
-        label=gettext_lazy("quota"), required=False, min_value=0, max_value=100
-    )
+    MIN_VALUE = 0
+    MAX_VALUE = 100
+
+    def __init__(self, scope_statements, weeks, quotas, data=None):
+        self.scope_statements = scope_statements
+        self.weeks = weeks
+        self.quotas = {
+            (quota.scope_statement_id, quota.week): quota for quota in quotas
+        }
+        self.names = [
+            [
+                "{}_{}-quota".format(scope_statement.id, week.strftime("%Y%m%d"))
+                for week in weeks
+            ]
+            for scope_statement in scope_statements
+        ]
+        self.errors = set()
+
+        if data is None:
+            self.values = [
+                [
+                    getattr(self.quotas.get((scope_statement.id, week)), "quota", None)
+                    for week in weeks
+                ]
+                for scope_statement in scope_statements
+            ]
+        else:
+            self.values = [
+                [data.get(name, "").strip() for name in row] for row in self.names
+            ]
+
+    def is_valid(self):
+        """Converts the posted values and collects the invalid cells"""
+        self.errors = set()
+        for i, row in enumerate(self.values):
+            for j, raw in enumerate(row):
+                if raw in (None, ""):
+                    row[j] = None
+                    continue
+                try:
+                    value = int(raw)
+                except (TypeError, ValueError):
+                    self.errors.add((i, j))
+                    continue
+                if self.MIN_VALUE <= value <= self.MAX_VALUE:
+                    row[j] = value
+                else:
+                    self.errors.add((i, j))
+        return not self.errors
+
+    def save(self):
+        """
+        Applies the differences to the existing quotas using a single upsert
+        and a single delete, returns the counts of created, updated and
+        deleted quotas
+        """
+        upserts = []
+        deleted = []
+        created = 0
+        updated = 0
+
+        for scope_statement, row in zip(self.scope_statements, self.values):
+            for week, value in zip(self.weeks, row):
+                quota = self.quotas.get((scope_statement.id, week))
+                if value is None:
+                    if quota is not None:
+                        deleted.append(quota.pk)
+                    continue
+
+                if quota is None:
+                    created += 1
+                elif quota.quota != value:
+                    updated += 1
+                else:
+                    continue
+                upserts.append(
+                    DrudgeQuota(scope_statement=scope_statement, week=week, quota=value)
+                )
+
+        with transaction.atomic():
+            DrudgeQuota.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=["scope_statement", "week"],
+                update_fields=["quota"],
+            )
+            if deleted:
+                DrudgeQuota.objects.filter(pk__in=deleted).delete()
+
+        return created, updated, len(deleted)
+
+    def rows(self):
+        """Yields the scope statements and the HTML of their inputs"""
+        for i, scope_statement in enumerate(self.scope_statements):
+            yield (
+                scope_statement,
+                format_html_join(
+                    "",
+                    '<td{}><input type="number" name="{}"{} min="{}" max="{}"'
+                    ' id="id_{}"></td>',
+                    (
+                        (
+                            mark_safe(' class="invalid"')
+                            if (i, j) in self.errors
+                            else "",
+                            name,
+                            "" if value is None else format_html(' value="{}"', value),
+                            self.MIN_VALUE,
+                            self.MAX_VALUE,
+                            name,
+                        )
+                        for j, (name, value) in enumerate(
+                            zip(self.names[i], self.values[i])
+                        )
+                    ),
+                ),
+            )
 
 
 @staff_member_required
 def quota_year(request, year):
     year = int(year)
-    first_day = date(year, 1, 1)
-    first_monday = first_day - timedelta(days=first_day.weekday())
-
-    all_forms = defaultdict(OrderedDict)
-    dates = list(yield_dates(first_monday, 7, 53))
+    first_monday = week_monday(date(year, 1, 1))
+    dates = week_mondays(first_monday, first_monday + timedelta(days=52 * 7))
 
-    scope_statements = ScopeStatement.objects.filter(is_active=True)
+    scope_statements = list(ScopeStatement.objects.filter(is_active=True))
+    quotas = DrudgeQuota.objects.filter(
+        scope_statement__in=scope_statements, week__in=dates
+    )
 
     if request.method == "POST":
-        created = 0
-        updated = 0
-        deleted = 0
+        grid = QuotaGrid(scope_statements, dates, quotas, request.POST)
+        if grid.is_valid():
+            created, updated, deleted = grid.save()
+            messages.success(
+                request,
+                _("Created %(c)s, updated %(u)s, deleted %(d)s quotas")
+                % {"c": created, "u": updated, "d": deleted},
+            )
+            return redirect(".")
 
-        for scope_statement in scope_statements:
-            existing_quotas = {
-                quota.week: quota for quota in scope_statement.drudgequota_set.all()
-            }
-            for day in dates:
-                try:
-                    value = int(
-                        request.POST[
-                            "{}_{}-quota".format(
-                                scope_statement.id, day.strftime("%Y%m%d")
-                            )
-                        ]
-                    )
-                except (KeyError, TypeError, ValueError):
-                    if day in existing_quotas:
-                        existing_quotas[day].delete()
-                        deleted += 1
-                    continue
-                else:
-                    if day in existing_quotas:
-                        if existing_quotas[day].quota != value:
-                            existing_quotas[day].quota = value
-                            existing_quotas[day].save()
-                            updated += 1
-                    else:
-                        DrudgeQuota.objects.create(
-                            scope_statement=scope_statement, week=day, quota=value
-                        )
-                        created += 1
-
-        messages.success(
-            request,
-            _("Created %(c)s, updated %(u)s, deleted %(d)s quotas")
-            % {"c": created, "u": updated, "d": deleted},
-        )
-        return redirect(".")
-
-    for scope_statement in scope_statements:
-        forms = all_forms[scope_statement]
-        existing_quotas = {
-            quota.week: quota.quota for quota in scope_statement.drudgequota_set.all()
-        }
+        messages.error(request, _("Please correct the highlighted quotas."))
 
-        for day in dates:
-            form = QuotaForm(
-                initial={"quota": existing_quotas.get(day)},
-                prefix="{}_{}".format(scope_statement.id, day.strftime("%Y%m%d")),
-            )
-            forms[day] = form
+    else:
+        grid = QuotaGrid(scope_statements, dates, quotas)
 
     return render(
         request,
         "zivinetz/quota_year.html",
-        {"year": year, "dates": dates, "all_forms": dict(all_forms)},
+        {"year": year, "dates": dates, "grid": grid},
     )
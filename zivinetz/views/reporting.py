@@ -1,7 +1,7 @@
 import operator
 import os
 from datetime import date, timedelta
-from functools import reduce
+from functools import lru_cache, reduce
 from io import BytesIO
 
 from django.conf import settings
@@ -11,7 +11,7 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
+from django.utils import timezone, translation
 from django.utils.translation import gettext as _
 from pdfdocument.document import PDFDocument, cm, mm
 from pdfdocument.elements import create_stationery_fn
@@ -21,20 +21,68 @@ from reportlab.lib import colors
 
 from zivinetz.forms import AssignmentSearchForm
 from zivinetz.models import Assignment, AssignmentChange, ExpenseReport, JobReference
+from zivinetz.utils.pdf_cache import (
+    cached_pdf_response,
+    fingerprint,
+    instance_values,
+    user_values,
+)
 from zivinetz.views.decorators import user_type_required
 
 
+EIV_TEMPLATE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "Einsatzvereinbarung.pdf"
+)
+
+
+@lru_cache(maxsize=32)
+def _parsed_pdf(storage, name, version):
+    writer = PdfWriter()
+    with storage.open(name, "rb") if storage else open(name, "rb") as f:
+        for page in PdfReader(f).pages:
+            writer.add_page(page)
+    return writer
+
+
+def pdf_version(name, storage=None):
+    """Returns the modification time of the file if available"""
+    try:
+        return storage.get_modified_time(name) if storage else os.path.getmtime(name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def parsed_pdf(name, storage=None):
+    """
+    Returns a ``PdfWriter`` containing the pages of the file ``name`` (a
+    path if no ``storage`` is given)
+
+    Files are parsed once per process and modification time. The pages are
+    shared between requests and must be added to another writer using
+    ``add_page`` before modifying them.
+    """
+    return _parsed_pdf(storage, name, pdf_version(name, storage))
+
+
 class AssignmentPDFStationery:
-    def __init__(self, assignment):
+    def __init__(self, assignment, *, page_offset=0):
         self.assignment = assignment
+        self.page_offset = page_offset
+        self.company_holiday = (
+            assignment.specification.scope_statement.company_holidays.filter(
+                date_until__gte=assignment.date_from,
+                date_from__lte=assignment.date_until,
+            ).first()
+        )
 
     def __call__(self, canvas, pdfdocument):
         # canvas.saveState()
         # canvas.restoreState()
 
-        if pdfdocument.doc.page == 1:
+        page = pdfdocument.doc.page - self.page_offset
+        if page == 1:
             self.page_1(canvas, pdfdocument)
-        elif pdfdocument.doc.page == 2:
+        elif page == 2:
             self.page_2(canvas, pdfdocument)
 
     markers = {
@@ -200,15 +248,7 @@ class AssignmentPDFStationery:
             for i, text in enumerate(reversed(frame)):
                 canvas.drawString(x, y + i * line, text)
 
-        try:
-            scope_statement = self.assignment.specification.scope_statement
-            company_holiday = scope_statement.company_holidays.filter(
-                date_until__gte=self.assignment.date_from,
-                date_from__lte=self.assignment.date_until,
-            )[0]
-        except IndexError:
-            company_holiday = None
-
+        company_holiday = self.company_holiday
         if company_holiday:
             canvas.drawString(
                 120 * mm, 86 * mm, company_holiday.date_from.strftime("%d.%m.%Y")
@@ -291,19 +331,49 @@ class AssignmentPDFStationery:
 @login_required
 def assignment_pdf(request, pk):
     assignment = get_object_or_404(
-        Assignment.objects.select_related("drudge__user"), pk=pk
+        Assignment.objects.select_related(
+            "drudge__user", "specification__scope_statement", "regional_office"
+        ),
+        pk=pk,
     )
 
     if not request.user.is_staff and assignment.drudge.user != request.user:
         return HttpResponseForbidden("<h1>Access forbidden</h1>")
 
-    result_writer = PdfWriter()
+    # The form starts on the second page
+    stationery = AssignmentPDFStationery(assignment, page_offset=1)
+    conditions = assignment.specification.conditions
 
-    # Generate the first page ################################################
-    first_page = BytesIO()
-    pdf = PDFDocument(first_page)
+    return cached_pdf_response(
+        request,
+        fingerprint(
+            "assignment",
+            date.today(),
+            instance_values(
+                assignment,
+                assignment.drudge,
+                assignment.specification,
+                assignment.specification.scope_statement,
+                assignment.regional_office,
+                stationery.company_holiday,
+            ),
+            user_values(assignment.drudge.user),
+            pdf_version(EIV_TEMPLATE),
+            conditions.name,
+            conditions and pdf_version(conditions.name, conditions.storage),
+        ),
+        f"attachment; filename=eiv-{assignment.pk}.pdf",
+        lambda output: render_assignment_pdf(assignment, stationery, output),
+    )
 
-    pdf.init_report()
+
+def render_assignment_pdf(assignment, stationery, output):
+    # Generate the first page and the overlays for the form #################
+    rendered = BytesIO()
+    pdf = PDFDocument(rendered)
+
+    # pdf.show_boundaries = True
+    pdf.init_report(page_fn=create_stationery_fn(stationery))
     pdf.generate_style(font_size=10)
 
     scope_statement = assignment.specification.scope_statement
@@ -350,67 +420,48 @@ Wir freuen uns auf deinen Einsatz!
 
     pdf.table([(address, address)], (8.2 * cm, 8.2 * cm), pdf.style.tableBase)
 
-    pdf.generate()
-
-    # Add the first page to the output #######################################
-    first_page_reader = PdfReader(first_page)
-    result_writer.add_page(first_page_reader.pages[0])
-
-    # Generate the form ######################################################
-    overlay = BytesIO()
-    pdf = PDFDocument(overlay)
-
-    # pdf.show_boundaries = True
-    pdf.init_report(page_fn=create_stationery_fn(AssignmentPDFStationery(assignment)))
-
+    # Two empty pages for the overlays (ReportLab drops a trailing break)
+    pdf.pagebreak()
     pdf.pagebreak()
     pdf.pagebreak()
 
     pdf.generate()
 
-    # Merge the form and the overlay, and add everything to the output #######
-    eiv_reader = PdfReader(
-        os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "data",
-            "Einsatzvereinbarung.pdf",
-        )
-    )
-    overlay_reader = PdfReader(overlay)
+    # Add the first page, and the form merged with the overlays ##############
+    result_writer = PdfWriter()
+    rendered_reader = PdfReader(rendered)
+    result_writer.add_page(rendered_reader.pages[0])
 
+    eiv = parsed_pdf(EIV_TEMPLATE)
     for idx in range(2):
-        page = eiv_reader.pages[idx]
-        page.merge_page(overlay_reader.pages[idx])
-        result_writer.add_page(page)
+        # add_page copies the cached page, merge into the copy
+        page = result_writer.add_page(eiv.pages[idx])
+        page.merge_page(rendered_reader.pages[idx + 1])
 
     # Add the conditions PDF if it exists ####################################
     if assignment.specification.conditions:
-        # conditions_reader = PdfReader(assignment.specification.conditions.open("rb"))
-        # for page in conditions_reader.pages:
-        #    result_writer.add_page(page)
-
         try:
-            conditions_reader = PdfReader(
-                assignment.specification.conditions.open("rb")
+            conditions = parsed_pdf(
+                assignment.specification.conditions.name,
+                assignment.specification.conditions.storage,
             )
-            for page in conditions_reader.pages:
+            for page in conditions.pages:
                 result_writer.add_page(page)
         except Exception as e:
             # Log the error but continue without the conditions PDF
             print(f"Error loading conditions PDF: {e}")
 
-    # Response! ##############################################################
-    response = HttpResponse(content_type="application/pdf")
-    result_writer.write(response)
-
-    response["Content-Disposition"] = f"attachment; filename=eiv-{assignment.pk}.pdf"
-    return response
+    result_writer.write(output)
 
 
 @login_required
 def expense_report_pdf(request, pk):
     report = get_object_or_404(
-        ExpenseReport.objects.select_related("assignment__drudge__user"),
+        ExpenseReport.objects.select_related(
+            "assignment__drudge__user",
+            "assignment__specification__scope_statement",
+            "specification",
+        ),
         pk=pk,
     )
 
@@ -423,11 +474,36 @@ def expense_report_pdf(request, pk):
         messages.error(request, _("No expense data, cannot generate report."))
         return redirect(report.assignment)
 
+    return cached_pdf_response(
+        request,
+        fingerprint(
+            "expense-report",
+            instance_values(
+                report,
+                report.assignment,
+                report.assignment.drudge,
+                report.assignment.specification,
+                report.assignment.specification.scope_statement,
+            ),
+            user_values(report.assignment.drudge.user),
+            table,
+            additional,
+            total,
+            translation.get_language(),
+        ),
+        'attachment; filename="expense-report-%s.pdf"' % report.pk,
+        lambda output: render_expense_report_pdf(
+            report, table, additional, total, output
+        ),
+    )
+
+
+def render_expense_report_pdf(report, table, additional, total, output):
     assignment = report.assignment
     drudge = assignment.drudge
     scope_statement = assignment.specification.scope_statement
 
-    pdf, response = pdf_response("expense-report-%s" % report.pk)
+    pdf = PDFDocument(output)
     pdf.init_report()
 
     pdf.h1("Spesenrapport")
@@ -517,16 +593,19 @@ def expense_report_pdf(request, pk):
     )
 
     pdf.generate()
-    return response
 
 
 class NaturnetzStationery:
+    @property
+    def logo(self):
+        return os.path.join(settings.BASE_DIR, "naturnetz", "data", "logo-new.jpg")
+
     def __call__(self, canvas, pdfdocument):
         canvas.saveState()
 
         try:
             canvas.drawImage(
-                os.path.join(settings.BASE_DIR, "naturnetz", "data", "logo-new.jpg"),
+                self.logo,
                 x=16 * cm,
                 y=24 * cm,
                 width=177 * 0.5,
@@ -548,9 +627,23 @@ def reference_pdf(request, pk):
         if reference.assignment.drudge.user != request.user:
             return HttpResponseForbidden("<h1>Access forbidden</h1>")
 
+    return cached_pdf_response(
+        request,
+        fingerprint(
+            "reference",
+            instance_values(reference, reference.assignment.drudge),
+            user_values(reference.assignment.drudge.user),
+            pdf_version(NaturnetzStationery().logo),
+        ),
+        'attachment; filename="reference-%s.pdf"' % reference.pk,
+        lambda output: render_reference_pdf(reference, output),
+    )
+
+
+def render_reference_pdf(reference, output):
     drudge = reference.assignment.drudge
 
-    pdf, response = pdf_response("reference-%s" % reference.pk)
+    pdf = PDFDocument(output)
     pdf.init_letter(page_fn=create_stationery_fn(NaturnetzStationery()))
 
     pdf.p(drudge.user.get_full_name())
@@ -569,7 +662,6 @@ def reference_pdf(request, pk):
     pdf.p(f"{reference.author_full_name}\n{reference.author_function}")
 
     pdf.generate()
-    return response
 
 
 @staff_member_required
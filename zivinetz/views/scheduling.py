@@ -1,68 +1,22 @@
-import calendar
 import itertools
 from collections import OrderedDict, defaultdict
 from datetime import date, timedelta
 
 from django import forms
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Q, Sum
+from django.db.models import Sum
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django.utils.translation import gettext_lazy
 from towel.forms import SearchForm
 
-from zivinetz.models import Assignment, DrudgeQuota, ScopeStatement
-
-
-# Calendar week calculation according to ISO 8601
-
-
-def _thursday(day):
-    return day + timedelta(days=3 - day.weekday())
-
-
-def _thursday_week1(year):
-    # 4.1. is always in the first calendar week
-    return _thursday(date(year, 1, 4))
-
-
-def _has_53_weeks(year):
-    first = _thursday_week1(year)
-
-    if calendar.isleap(year):
-        # Year begins on a wednesday
-        return first.day == 2
-    # Year begins on a thursday
-    return first.day == 1
-
-
-def calendar_week(day):
-    delta = _thursday(day) - _thursday_week1(day.year)
-    week = int(1.5 + delta.days / 7)
-
-    if 0 < week < 53:
-        return (day.year, week)
-
-    if week == 0:
-        if day < _thursday_week1(day.year):
-            # Day belongs to last calendar week of the year before
-            return (day.year - 1, _has_53_weeks(day.year - 1) and 53 or 52)
-
-        return (day.year, _has_53_weeks(day.year) and 53 or 52)
-
-    if week == 53:
-        if _has_53_weeks(day.year):
-            return (day.year, 53)
-        # Otherwise, it is already week one of the next year
-        return (day.year + 1, 1)
-
-    raise Exception(f"Unexpected week number {week} for {day}")
-
-
-def daterange(start_date, end_date):
-    """Iterate over a range of dates (includes the end_date)"""
-    for nr in range((end_date - start_date).days + 1):
-        yield start_date + timedelta(days=nr)
+from zivinetz.models import (
+    Assignment,
+    DrudgeQuota,
+    ScopeStatement,
+    WeeklyOccupancy,
+)
+from zivinetz.utils.weeks import calendar_week, week_monday, week_mondays
 
 
 class Scheduler:
@@ -70,7 +24,7 @@ class Scheduler:
         self.queryset = assignments
         self.date_range = date_range
 
-        self.date_from = _monday(date_range[0])
+        self.date_from = week_monday(date_range[0])
         self.date_until = date_range[1]
 
         if self.date_from:  # Is None if no assignments in queryset
@@ -81,73 +35,63 @@ class Scheduler:
                 (self.date_range[1] - self.date_from).days // 7 + 1,
             )
 
-        self.date_list = list(daterange(self.date_from, self.date_until))
-        self.drudge_days_per_week = OrderedDict()
-        for day in self.date_list:
-            self.drudge_days_per_week.setdefault(
-                calendar_week(day), (day, defaultdict(lambda: 0))
-            )
+        self.mondays = week_mondays(self.date_from, self.date_until)
+
+    def _week_indexes(self, date_from, date_until):
+        """
+        Returns the range of indexes into ``mondays`` of the weeks which
+        overlap the interval ``[date_from, date_until]``
+        """
+        return range(
+            max(0, (date_from - self.date_from).days // 7),
+            min(len(self.mondays), (date_until - self.date_from).days // 7 + 1),
+        )
 
     def weeks(self):
         ret = []
 
         if self.date_from:
-            monday = _monday(self.date_from)
-            this_monday = _monday(date.today())
-
-            while True:
-                ret.append((monday, *calendar_week(monday), monday == this_monday))
-
-                monday += timedelta(days=7)
-                if monday > self.date_until:
-                    break
-
-            ret = ret[self.date_slice]
+            this_monday = week_monday(date.today())
+            ret = [
+                (monday, *calendar_week(monday), monday == this_monday)
+                for monday in self.mondays
+            ][self.date_slice]
 
         return ret
 
     def _schedule_assignment(self, date_from, date_until, courses=None):
-        weeks = []
-        cw = None
-        inside = False
         courses = {} if courses is None else courses
 
         # Not all courses start on a monday, but we have to normalize
         # dates to monday otherwise we wont find them while scheduling.
         week_courses = {
-            _monday(day) if day else None: (day, type) for day, type in courses.items()
+            week_monday(day) if day else None: (day, type)
+            for day, type in courses.items()
         }
 
-        for day in self.date_list:
-            new_cw = calendar_week(day)
-            if new_cw == cw:
-                continue
-            cw = new_cw
-
-            if date_from <= day <= date_until:
-                css = "a"
-                title = None
-                if day in week_courses:
-                    css += " c-%s" % week_courses[day][1].lower()
-                    title = "{} (Start: {})".format(
-                        week_courses[day][0],
-                        week_courses[day][0].strftime("%A %d.%m."),
-                    )
-
-                if inside:
-                    weeks.append([css, "", title])
-                else:
-                    inside = True
-                    if calendar_week(day) == calendar_week(date_from):
-                        weeks.append([css, date_from.day, title])
-                    else:
-                        # assignment has not started this week
-                        weeks.append([css, "", title])
-            else:
-                if inside:
-                    inside = False
-                    weeks[-1][1] = date_until.day
-                weeks.append(["", "", None])
+        weeks = [["", "", None] for monday in self.mondays]
+
+        # Weeks whose monday lies inside the assignment
+        inside = self._week_indexes(date_from + timedelta(days=6), date_until)
+        for index in inside:
+            monday = self.mondays[index]
+            css = "a"
+            title = None
+            if monday in week_courses:
+                css += " c-%s" % week_courses[monday][1].lower()
+                title = "{} (Start: {})".format(
+                    week_courses[monday][0],
+                    week_courses[monday][0].strftime("%A %d.%m."),
+                )
+            weeks[index] = [css, "", title]
+
+        if inside:
+            if self.mondays[inside[0]] == week_monday(date_from):
+                weeks[inside[0]][1] = date_from.day
+            if inside[-1] + 1 < len(weeks):
+                # The assignment ends before the last visible week
+                weeks[inside[-1]][1] = date_until.day
+
         return weeks
 
     def add_quotas(self, with_accomodation, scope_statements):
@@ -176,14 +120,22 @@ class Scheduler:
 
         una_courses_per_week = defaultdict(list)
 
-        for assignment in assignments:
-            for day in daterange(
-                assignment.date_from, assignment.determine_date_until()
-            ):
-                self.drudge_days_per_week.setdefault(
-                    calendar_week(day), (_monday(day), defaultdict(int))
-                )[1][assignment.drudge_id] += 1
+        # Days of assignment per drudge in each visible week
+        drudge_days_per_week = [defaultdict(int) for monday in self.mondays]
+        for row in (
+            WeeklyOccupancy.objects
+            .filter(
+                assignment__in=self.queryset.values("id"),
+                week__range=(self.date_from, self.date_until),
+            )
+            .order_by()
+            .values("week", "drudge")
+            .annotate(days=Sum("days"))
+        ):
+            index = (row["week"] - self.date_from).days // 7
+            drudge_days_per_week[index][row["drudge"]] = row["days"]
 
+        for assignment in assignments:
             if assignment.environment_course_date and (
                 assignment.date_from
                 <= assignment.environment_course_date
@@ -192,7 +144,7 @@ class Scheduler:
                 # Only subtract env course if it is during the assignment.
                 # (Can be outside in rare cases.)
                 una_courses_per_week[
-                    _monday(assignment.environment_course_date)
+                    week_monday(assignment.environment_course_date)
                 ].append(assignment)
 
             if assignment.drudge not in assignments_dict:
@@ -213,11 +165,9 @@ class Scheduler:
         # linearize assignments, but still give precedence to drudge
         assignments = list(itertools.chain.from_iterable(assignments_dict.values()))
 
-        filtered_days_per_drudge_and_week = [
-            (day, week)
-            for day, week in self.drudge_days_per_week.values()
-            if self.date_from <= day <= self.date_until
-        ]
+        filtered_days_per_drudge_and_week = list(
+            zip(self.mondays, drudge_days_per_week)
+        )
 
         # Weekly count is determined by the count of drudges which are
         # available at least 3 days in a week.
@@ -289,15 +239,11 @@ class Scheduler:
         return assignments
 
 
-def _monday(day):
-    return day - timedelta(days=day.weekday())
-
-
 class SchedulingSearchForm(SearchForm):
     default = {
-        "date_until__gte": lambda request: _monday(date.today()),
+        "date_until__gte": lambda request: week_monday(date.today()),
         "date_from__lte": lambda request: (
-            _monday(date.today()) + timedelta(days=35 * 7 + 4)
+            week_monday(date.today()) + timedelta(days=35 * 7 + 4)
         ),
         "status": (Assignment.TENTATIVE, Assignment.ARRANGED, Assignment.MOBILIZED),
     }
@@ -341,18 +287,12 @@ class SchedulingSearchForm(SearchForm):
         queryset = self.apply_filters(
             Assignment.objects.search(data.get("query")),
             data,
-            exclude=("date_until__gte",),
+            exclude=("date_until__gte", "date_from__lte"),
         )
-        if data.get("date_until__gte"):
-            queryset = queryset.filter(
-                Q(
-                    date_until_extension__isnull=True,
-                    date_until__gte=data.get("date_until__gte"),
-                )
-                | Q(
-                    date_until_extension__isnull=False,
-                    date_until_extension__gte=data.get("date_until__gte"),
-                )
+        if data.get("date_until__gte") or data.get("date_from__lte"):
+            # A single range lookup using the GiST index
+            queryset = queryset.overlapping(
+                data.get("date_until__gte"), data.get("date_from__lte")
             )
         return queryset
 